@@ -0,0 +1,151 @@
+from load_profile import LoadProfile
+
+__all__ = ["regret_insertion"]
+
+# constants
+NEIGHBOUR_COUNT = 8                # nearest cities used to shortlist routes for an order
+SINGLE_OPTION_REGRET = float('inf')
+
+def _route_cities(veh, stops, orders):
+    # city index sequence of a route: start, stops..., end (end omitted when open)
+    seq = [veh['start']] + [orders[oid][0 if kind == 'pickup' else 1] for oid, kind in stops]
+    if veh.get('end') is not None:
+        seq.append(veh['end'])
+    return seq
+
+def _best_insertion(cost_m, veh, stops, profile, order, ignore_capacity=False):
+    """Cheapest (delta, i, j) inserting pickup after position i and delivery after j (i <= j)."""
+    p, d, dem = order[0], order[1], order[2]
+    seq = veh['_seq']
+    n = len(stops)
+    best = None
+    for i in range(n + 1):
+        a = seq[i]
+        b = seq[i + 1] if i + 1 < len(seq) else None
+        if not ignore_capacity and not profile.can_insert(i, i, dem):
+            continue
+        add_p = cost_m[a][p] + (cost_m[p][b] - cost_m[a][b] if b is not None else 0)
+        # delivery right after the pickup
+        delta = cost_m[a][p] + cost_m[p][d] + (cost_m[d][b] - cost_m[a][b] if b is not None else 0)
+        if best is None or delta < best[0]:
+            best = (delta, i, i)
+        # delivery later in the route; load between the two must stay under capacity
+        for j in range(i + 1, n + 1):
+            if not ignore_capacity and not profile.can_insert(i, j, dem):
+                break
+            c = seq[j]
+            e = seq[j + 1] if j + 1 < len(seq) else None
+            delta = add_p + cost_m[c][d] + (cost_m[d][e] - cost_m[c][e] if e is not None else 0)
+            if delta < best[0]:
+                best = (delta, i, j)
+    return best
+
+def regret_insertion(cost_m, orders, vehicles, unit_type=None, neighbours=None, priority=None, open_cost=0):
+    """Regret-2 insertion of pickup & delivery pairs on a precomputed cost matrix.
+
+    cost_m: square matrix over city indices. orders: [(pickup idx, delivery idx, demand)].
+    vehicles: [{'start': idx, 'end': idx or None, 'capacity': kg}], one per unit.
+    unit_type: type id per unit; only the first idle unit of each type is tried.
+    neighbours: city idx -> set of nearby city idx, used to shortlist routes.
+    priority: per-order sort key for ties (e.g. deadline, smaller first).
+    open_cost: added to any insertion that puts an idle unit on the road.
+
+    Returns (stops per unit, forced) where stops are [(order idx, 'pickup'|'delivery')]
+    and forced lists orders that fit no vehicle and were inserted over capacity.
+    """
+    unit_type = unit_type if unit_type is not None else list(range(len(vehicles)))
+    priority = priority if priority is not None else [0] * len(orders)
+    vehs = [dict(v) for v in vehicles]
+    stops = [[] for _ in vehs]
+    loads = [LoadProfile([], veh['capacity']) for veh in vehs]   # load on board after each stop
+    near_cities = [set() for _ in vehs]
+    for v, veh in enumerate(vehs):
+        veh['_seq'] = _route_cities(veh, [], orders)
+        near_cities[v].update(veh['_seq'])
+
+    idle = {}
+    for v in range(len(vehs)):
+        idle.setdefault(unit_type[v], []).append(v)
+    used = set()
+
+    def candidates(oid):
+        reps = {units[0] for units in idle.values() if units}
+        if neighbours is None:
+            return used | reps
+        p, d = orders[oid][0], orders[oid][1]
+        zone = neighbours(p) | neighbours(d)
+        short = {v for v in used if near_cities[v] & zone}
+        # keep at least something to compare against when nothing is close by
+        return (short or used) | reps
+
+    def evaluate(oid, v):
+        ins = _best_insertion(cost_m, vehs[v], stops[v], loads[v], orders[oid])
+        if ins is not None and v not in used:
+            ins = (ins[0] + open_cost, ins[1], ins[2])
+        return ins
+
+    unassigned = set(range(len(orders)))
+    cache = {oid: {} for oid in unassigned}
+    for oid in unassigned:
+        for v in candidates(oid):
+            ins = evaluate(oid, v)
+            if ins is not None:
+                cache[oid][v] = ins
+
+    forced = []
+    while unassigned:
+        pick, pick_key = None, None
+        for oid in unassigned:
+            opts = sorted(ins[0] for ins in cache[oid].values())
+            if not opts:
+                key = (1, SINGLE_OPTION_REGRET, -priority[oid])
+            elif len(opts) == 1:
+                key = (0, SINGLE_OPTION_REGRET, -priority[oid])
+            else:
+                key = (0, opts[1] - opts[0], -priority[oid])
+            if pick_key is None or key > pick_key:
+                pick, pick_key = oid, key
+
+        oid = pick
+        unassigned.discard(oid)
+        options = cache.pop(oid)
+        if options:
+            v = min(options, key=lambda u: options[u][0])
+            _, i, j = options[v]
+        else:
+            # no unit can carry it: keep the previous fallback behaviour and place it anyway
+            forced.append(oid)
+            cands = candidates(oid) or set(range(len(vehs)))
+            best = None
+            for u in cands:
+                ins = _best_insertion(cost_m, vehs[u], stops[u], loads[u], orders[oid], ignore_capacity=True)
+                if best is None or ins[0] < best[1][0]:
+                    best = (u, ins)
+            v, (_, i, j) = best
+
+        stops[v][j:j] = [(oid, 'delivery')]
+        stops[v][i:i] = [(oid, 'pickup')]
+        loads[v] = loads[v].insert(i, j, orders[oid][2])
+        vehs[v]['_seq'] = _route_cities(vehs[v], stops[v], orders)
+        near_cities[v].update((orders[oid][0], orders[oid][1]))
+
+        new_reps = []
+        if v not in used:
+            used.add(v)
+            units = idle[unit_type[v]]
+            units.remove(v)
+            if units:
+                new_reps.append(units[0])
+
+        # only the touched route (and a newly exposed idle unit) change for everyone else
+        for other in unassigned:
+            entry = cache[other]
+            entry.pop(v, None)
+            cands = candidates(other)
+            for u in [v] + new_reps:
+                if u in cands:
+                    ins = evaluate(other, u)
+                    if ins is not None:
+                        entry[u] = ins
+
+    return stops, forced
@@ -0,0 +1,36 @@
+__all__ = ["vehicle_types", "expand_fleet"]
+
+# profile fields that make two trucks interchangeable for the solver
+TYPE_KEY_FIELDS = ("nume", "capacitate", "echipaj", "start_city", "end_city", "open_route")
+
+def _type_key(vp):
+    return tuple(vp.get(k) for k in TYPE_KEY_FIELDS)
+
+def vehicle_types(vehicle_profiles):
+    """Merge identical profiles into one type each, summing their `numar`."""
+    types = []
+    by_key = {}
+    for vp in vehicle_profiles:
+        key = _type_key(vp)
+        count = int(vp.get("numar", 1) or 0)
+        if key in by_key:
+            by_key[key]["numar"] += count
+            continue
+        vt = dict(vp)
+        vt["numar"] = count
+        by_key[key] = vt
+        types.append(vt)
+    return [vt for vt in types if vt["numar"] > 0]
+
+def expand_fleet(types):
+    """Physical units of a type list: (unit profiles, type index per unit).
+
+    Units of one type share the same profile dict and are contiguous, so the
+    solver can treat them as a symmetric block.
+    """
+    units, unit_type = [], []
+    for t, vt in enumerate(types):
+        for _ in range(vt["numar"]):
+            units.append(vt)
+            unit_type.append(t)
+    return units, unit_type
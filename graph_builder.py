@@ -1,34 +1,132 @@
+import heapq
 import networkx as nx
 import json
+from instrumentation import incr, stage
+from road_index import build_road_index, save_road_index, load_road_index, graph_fingerprint
+from road_network import compile_network, save_network, load_network, network_fingerprint
+from traffic import load_speed_profiles, duration_at, SPEED_PROFILES_FILE
 
 # Load road data from JSON
 def load_road_data(path: str):
     with open(path, encoding="utf-8") as f:
         return json.load(f)
 
-def build_graph(city_coords: dict, road_file: str = "roads.json") -> nx.Graph:
-    """Build weighted graph using distance and duration from roads.json."""
+def build_graph(city_coords: dict, road_file: str = "roads.json", index_path: str = None,
+                profiles_file: str = SPEED_PROFILES_FILE, network_path: str = None) -> nx.Graph:
+    """Build weighted graph using distance and duration from roads.json.
+
+    Roads go through road_network.compile_network first (the compiled network is
+    reused from `network_path` when it matches the input, otherwise written
+    there), so only validated, merged edges reach the graph. The city ->
+    component id map is kept as G.graph["component"] for reachable().
+    With `index_path` a contraction-hierarchy index is attached (see attach_index).
+    A road may carry a `speed_profile`: 24 hourly duration factors, or the name
+    of one in `profiles_file`; such edges are kept as the `speed_profile` attribute.
+    """
     G = nx.Graph()
-    roads = load_road_data(road_file)
-    for road in roads:
-        a = road.get("from")
-        b = road.get("to")
-        dist = float(road.get("distance_km", 0) or 0.0)
-        dur = float(road.get("duration_hours", 0) or 0.0)
-        if a not in city_coords or b not in city_coords:
-            # Skip edges referencing unknown cities
-            continue
+    network = load_network_for(city_coords, road_file, network_path)
+    profiles = load_speed_profiles(profiles_file)
+    for a, b, dist, dur, prof in network.edges:
         G.add_edge(a, b, distance=dist, duration=dur)
+        if isinstance(prof, str):
+            prof = profiles[prof]
+        if prof:
+            G.edges[a, b]["speed_profile"] = [float(x) for x in prof]
+    G.graph["time_dependent"] = any("speed_profile" in d for _, _, d in G.edges(data=True))
+    G.graph["component"] = network.component_map()
+    if index_path:
+        attach_index(G, index_path)
+    return G
+
+def load_network_for(city_coords: dict, road_file: str = "roads.json", network_path: str = None):
+    """Compiled road network for these cities and roads (see build_graph)."""
+    roads = load_road_data(road_file)
+    fingerprint = network_fingerprint(roads, city_coords)
+    network = load_network(network_path, fingerprint) if network_path else None
+    if network is None:
+        with stage("compile_network"):
+            network = compile_network(roads, city_coords)
+        if network_path:
+            save_network(network, network_path, fingerprint)
+    incr("road_issues", len(network.issues))
+    return network
+
+def reachable(G: nx.Graph, source: str, target: str) -> bool:
+    """O(1) road reachability from the component ids build_graph attached."""
+    comp = G.graph.get("component")
+    if comp is None:
+        return source in G and target in G and nx.has_path(G, source, target)
+    cs = comp.get(source)
+    return cs is not None and cs == comp.get(target)
+
+def attach_index(G: nx.Graph, index_path: str = None) -> nx.Graph:
+    """Attach a contraction-hierarchy index so the queries below skip plain Dijkstra.
+
+    The index is loaded from `index_path` when it was built for this same graph,
+    otherwise built and (if a path is given) written there for the next start.
+    """
+    fingerprint = graph_fingerprint(G)
+    index = load_road_index(index_path, fingerprint) if index_path else None
+    if index is None:
+        with stage("build_road_index"):
+            index = build_road_index(G)
+        if index_path:
+            save_road_index(index, index_path, fingerprint)
+    G.graph["road_index"] = index
     return G
 
+def _indexed(G, weight, source, target, path=False):
+    # query the attached index, raising like networkx does
+    ch = G.graph["road_index"][weight]
+    if source not in G or target not in G:
+        raise nx.NodeNotFound(f"{source} or {target} not in graph")
+    if not reachable(G, source, target):
+        raise nx.NetworkXNoPath(f"no path between {source} and {target}")
+    incr("index_queries")
+    res = ch.path(source, target) if path else ch.length(source, target)
+    if res is None:
+        raise nx.NetworkXNoPath(f"no path between {source} and {target}")
+    return res
+
 def get_distance(G: nx.Graph, source: str, target: str) -> float:
     """Shortest-path distance in km."""
+    if "road_index" in G.graph:
+        return _indexed(G, "distance", source, target)
+    incr("dijkstra_calls")
     return nx.dijkstra_path_length(G, source, target, weight="distance")
 
 def get_duration(G: nx.Graph, source: str, target: str) -> float:
     """Shortest-path duration in hours."""
+    if "road_index" in G.graph:
+        return _indexed(G, "duration", source, target)
+    incr("dijkstra_calls")
     return nx.dijkstra_path_length(G, source, target, weight="duration")
 
+def get_duration_at(G: nx.Graph, source: str, target: str, depart_hour: float) -> float:
+    """Shortest duration in hours leaving `source` at clock `depart_hour` (time-dependent Dijkstra)."""
+    if not G.graph.get("time_dependent"):
+        return get_duration(G, source, target)
+    if source not in G or target not in G:
+        raise nx.NodeNotFound(f"{source} or {target} not in graph")
+    incr("td_dijkstra_calls")
+    arrival = {source: depart_hour}
+    heap = [(depart_hour, source)]
+    while heap:
+        t, u = heapq.heappop(heap)
+        if u == target:
+            return t - depart_hour
+        if t > arrival[u]:
+            continue
+        for v, d in G[u].items():
+            nt = t + duration_at(d["duration"], d.get("speed_profile"), t)
+            if nt < arrival.get(v, float('inf')):
+                arrival[v] = nt
+                heapq.heappush(heap, (nt, v))
+    raise nx.NetworkXNoPath(f"no path between {source} and {target}")
+
 def get_path(G: nx.Graph, source: str, target: str) -> list:
     """Shortest path by distance (list of city names)."""
+    if "road_index" in G.graph:
+        return _indexed(G, "distance", source, target, path=True)
+    incr("dijkstra_calls")
     return nx.dijkstra_path(G, source, target, weight="distance")
\ No newline at end of file
@@ -0,0 +1,165 @@
+from graph_builder import build_graph
+from instrumentation import collect, stage, set_value
+from fleet import vehicle_types, expand_fleet, TYPE_KEY_FIELDS
+from kpi import plan_cost
+from load_profile import stamp_loads
+from vrp_solver import solve_vrp, SolveCancelled, ROAD_INDEX_FILE, ROAD_NETWORK_FILE, MAX_TIME_LIMIT, _route_steps, _vehicle_ends, _stamp_departure
+
+__all__ = ["plan_rolling_horizon"]
+
+# constants
+HORIZON_SLICE_HOURS = 24           # committed part of each slice (one working day)
+HORIZON_OVERLAP_HOURS = 12         # look-ahead planned with the slice but not committed
+
+def _deadline(order):
+    return float(order.get("time_limit_hrs", MAX_TIME_LIMIT))
+
+def _position_groups(units, unit_type, pos, home):
+    # one vehicle type per (profile, current position, home yard); returns profiles and their unit lists
+    profiles, members, by_key = [], [], {}
+    for u, vp in enumerate(units):
+        prof = {k: vp[k] for k in vp if k not in ("start_city", "end_city", "open_route")}
+        prof.update(numar=0, start_city=pos[u])
+        if home[u] is None:
+            prof["open_route"] = True
+        else:
+            prof["end_city"] = home[u]
+        # grouped exactly as fleet.vehicle_types will, so solver units map back in order
+        key = tuple(prof.get(k) for k in TYPE_KEY_FIELDS)
+        if key not in by_key:
+            by_key[key] = len(profiles)
+            profiles.append(prof)
+            members.append([])
+        g = by_key[key]
+        profiles[g]["numar"] += 1
+        members[g].append(u)
+    return profiles, members
+
+def _commit_cut(steps, near, final):
+    # index of the last step to commit: the longest prefix whose stops are near-term
+    # orders with every pickup delivered (everything on the final slice)
+    if final:
+        return len(steps) - 1
+    cut, onboard = 0, set()
+    for j, step in enumerate(steps):
+        kind = step.get("tip")
+        if kind not in ("pickup", "delivery"):
+            continue
+        oid = step.get("order_id")
+        if oid not in near:
+            break
+        if kind == "pickup":
+            onboard.add(oid)
+        else:
+            onboard.discard(oid)
+        if not onboard:
+            cut = j
+    return cut
+
+def _merge_slice(metrics, slice_metrics, n):
+    # a slice's own collector folded into the horizon's: stage times and counters add up,
+    # its solve facts are kept per slice
+    for part in ("stages", "counters"):
+        for k, v in slice_metrics.get(part, {}).items():
+            metrics[part][k] = metrics[part].get(k, 0) + v
+    metrics["values"][f"slice_{n}"] = slice_metrics.get("values", {})
+
+def plan_rolling_horizon(start_city, pd_requests, coords, vehicle_profiles, routing_mode,
+                         slice_hours=HORIZON_SLICE_HOURS, overlap_hours=HORIZON_OVERLAP_HOURS,
+                         metrics=None, profile=False, trace_memory=False, progress=None, cancel_event=None,
+                         graph=None, open_routes=False, **solve_kwargs):
+    """Multi-day plan solved slice by slice; returns (routes, polylines, total_cost) like solve_vrp.
+
+    Day d solves the pending orders due before (d+1)*slice_hours + overlap_hours,
+    each vehicle starting where its committed work so far ended, and commits
+    only the near-term part: per route, the prefix of stops serving orders due
+    that day (with every pickup delivered). The rest is re-planned with the next
+    slice; the last slice commits everything, including the way home.
+    Only positions carry over between slices, not the clock.
+
+    `metrics` / `profile` / `trace_memory` cover the whole horizon: each
+    slice's stage times and counters are added to it and its solve facts are
+    kept under values["slice_<n>"].
+    """
+    with collect(metrics, profile=profile, trace_memory=trace_memory) as metrics:
+        if graph is None:
+            with stage("build_graph"):
+                graph = build_graph(coords, index_path=ROAD_INDEX_FILE, network_path=ROAD_NETWORK_FILE)
+        units, unit_type = expand_fleet(vehicle_types(vehicle_profiles or []))
+        ends = [_vehicle_ends(vp, start_city, open_routes) for vp in units]
+        pos = [s for s, _ in ends]
+        home = [e for _, e in ends]
+        committed = [[] for _ in units]  # steps per physical unit, without the departure row
+
+        pending = sorted(range(len(pd_requests)), key=lambda i: _deadline(pd_requests[i]))
+        day = slices = 0
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            t0 = day * slice_hours
+            window_end = t0 + slice_hours + overlap_hours
+            final = all(_deadline(pd_requests[i]) < window_end for i in pending)
+            in_window = [i for i in pending if _deadline(pd_requests[i]) < window_end]
+            near = {i for i in in_window if final or _deadline(pd_requests[i]) < t0 + slice_hours}
+            day += 1
+            if not near:
+                continue
+
+            # slice orders carry their index as id and a deadline relative to the slice start
+            reqs = []
+            for i in in_window:
+                r = dict(pd_requests[i])
+                r["id"] = i
+                r["time_limit_hrs"] = _deadline(pd_requests[i]) - t0
+                reqs.append(r)
+            profiles, members = _position_groups(units, unit_type, pos, home)
+            unit_of = [u for m in members for u in m]
+
+            slice_metrics = {}
+            try:
+                with stage("horizon_slice"):
+                    routes, _, _ = solve_vrp(start_city, reqs, coords, profiles, routing_mode, graph=graph,
+                                             metrics=slice_metrics, progress=progress, cancel_event=cancel_event,
+                                             **solve_kwargs)
+            except SolveCancelled:
+                break   # keep the days already committed
+            slices += 1
+            _merge_slice(metrics, slice_metrics, slices)
+
+            done = set()
+            for route in routes:
+                u = unit_of[route["unitate"]]
+                steps = route["traseu"]
+                cut = _commit_cut(steps, near, final)
+                for step in steps[1:cut + 1]:
+                    if step.get("tip") in ("pickup", "delivery"):
+                        i = step["order_id"]
+                        done.add(i)
+                        # back to the caller's order id and absolute deadline
+                        step["order_id"] = step["comanda"] = pd_requests[i].get("id", i)
+                        step["time_limit"] = pd_requests[i].get("time_limit_hrs")
+                    committed[u].append(step)
+                pos[u] = steps[cut]["oras"]
+            pending = [i for i in pending if i not in done]
+            set_value(f"slice_{slices}_orders", len(reqs))
+
+        # vehicles not routed by the last slice still drive home
+        for u, steps in enumerate(committed):
+            if steps and steps[-1].get("tip") != "intoarcere" and home[u] is not None and pos[u] != home[u]:
+                back, _ = _route_steps(graph, coords, pd_requests, pos[u], home[u], [])
+                steps.extend(back[1:])
+
+        routes, polylines = [], []
+        for u, steps in enumerate(committed):
+            if not steps:
+                continue
+            traseu = [{'tip': 'plecare', 'oras': ends[u][0], 'distanta': 0, 'durata': 0, 'comanda': None}] + steps
+            routes.append({'vehicul': units[u], 'unitate': u, 'traseu': traseu})
+            polylines.append([coords[s['oras']]['coords'] for s in traseu])
+        _stamp_departure(routes, solve_kwargs.get("departure_hour"))
+        # slice loads restart at each slice's start; re-stamp along the whole day
+        set_value("overloaded_routes", stamp_loads(routes))
+        set_value("horizon_slices", slices)
+        set_value("unplanned_orders", len(pending))
+        set_value("vehicles_used", len(routes))
+    return routes, polylines, plan_cost(routes, routing_mode)
@@ -0,0 +1,209 @@
+from graph_builder import build_graph
+from instrumentation import collect, stage, incr, set_value
+from timeline import build_timeline, SERVICE_TIME
+from load_profile import route_profile, stamp_loads
+from vrp_solver import ROAD_INDEX_FILE, ROAD_NETWORK_FILE, MAX_TIME_LIMIT, _expand_leg_to_steps, _pair_lengths
+
+__all__ = ["insertion_options", "apply_insertion"]
+
+# constants
+DEFAULT_TOP_K = 3
+MAX_CHECKED_INSERTIONS = 64        # cheapest candidates replayed on the timeline before giving up
+STOP_STEP_TYPES = ("pickup", "delivery")
+
+def _route_shape(route):
+    """(stop step indices, stop cities, end city or None) of a solved route.
+
+    Stops are the departure plus every pickup / delivery; the end is the yard
+    the route returns to (None for an open route).
+    """
+    steps = route["traseu"]
+    idx = [0] + [k for k in range(1, len(steps)) if steps[k].get("tip") in STOP_STEP_TYPES]
+    veh = route.get("vehicul") if isinstance(route.get("vehicul"), dict) else {}
+    last = steps[-1]
+    if last.get("tip") == "intoarcere":
+        end = last["oras"]
+    elif veh.get("open_route"):
+        end = None
+    else:
+        # a route whose last delivery is at its yard has no return leg
+        home = veh.get("end_city") or steps[0]["oras"]
+        end = home if last["oras"] == home else None
+    return idx, [steps[k]["oras"] for k in idx], end
+
+def _late_orders(route):
+    return {row["Order"] for row in build_timeline([route])[1]}
+
+def _departures(route, idx):
+    # clock hour (since the route's start) each stop is left, from the compliance timeline
+    arrival = {row["step_index"]: row["elapsed_h"] for row in build_timeline([route])[0]
+               if row.get("step_index") is not None}
+    steps = route["traseu"]
+    return [arrival.get(k, 0.0) + (SERVICE_TIME if steps[k].get("tip") in STOP_STEP_TYPES else 0.0) for k in idx]
+
+def _reroute(G, coords, prev_city, stop_step):
+    # leg from prev_city into an existing stop, keeping that stop's order fields
+    leg, _ = _expand_leg_to_steps(G, coords, prev_city, stop_step["oras"], stop_step["tip"])
+    last = {k: v for k, v in stop_step.items() if k != "speed_profile"}
+    last["distanta"], last["durata"] = leg[-1]["distanta"], leg[-1]["durata"]
+    if leg[-1].get("speed_profile"):
+        last["speed_profile"] = leg[-1]["speed_profile"]
+    return leg[:-1] + [last]
+
+def _candidate_steps(G, coords, route, idx, end, order, i, j):
+    # route steps with the order's pickup after stop i and its delivery after stop j
+    steps = route["traseu"]
+    n = len(idx) - 1
+    cities = [steps[k]["oras"] for k in idx]
+
+    def finish(prev_city, k):
+        # the rest of the route after stop k, now reached from prev_city
+        if k < n:
+            return _reroute(G, coords, prev_city, steps[idx[k + 1]]) + steps[idx[k + 1] + 1:]
+        if end is None or prev_city == end:
+            return []
+        return _expand_leg_to_steps(G, coords, prev_city, end, "intoarcere")[0]
+
+    out = list(steps[:idx[i] + 1])
+    out += _expand_leg_to_steps(G, coords, cities[i], order["pickup"], "pickup", order_meta=order)[0]
+    if i == j:
+        out += _expand_leg_to_steps(G, coords, order["pickup"], order["delivery"], "delivery", order_meta=order)[0]
+        return out + finish(order["delivery"], j)
+    out += _reroute(G, coords, order["pickup"], steps[idx[i + 1]])
+    out += steps[idx[i + 1] + 1:idx[j] + 1]
+    out += _expand_leg_to_steps(G, coords, cities[j], order["delivery"], "delivery", order_meta=order)[0]
+    return out + finish(order["delivery"], j)
+
+def _candidates(route, idx, cities, end, order, profile, lengths, cost_axis, now_h):
+    # every capacity-feasible (delta, i, j) of one route; delta = (km, h)
+    p, d, dem = order["pickup"], order["delivery"], float(order["demand"])
+    seq = cities + ([end] if end is not None else [])
+    n = len(idx) - 1
+    # stops already left (or being driven away from) at now_h are fixed
+    first = 0
+    if now_h is not None:
+        dep = _departures(route, idx)
+        first = next((k for k in range(n + 1) if dep[k] >= now_h), n + 1)
+
+    def add(*pairs):
+        km = h = 0.0
+        for sign, a, b in pairs:
+            if a is None or b is None:
+                continue
+            dk, dh = lengths(a, b)
+            km += sign * dk
+            h += sign * dh
+        return km, h
+
+    out = []
+    for i in range(first, n + 1):
+        if not profile.can_insert(i, i, dem):
+            continue
+        a = seq[i]
+        b = seq[i + 1] if i + 1 < len(seq) else None
+        delta = add((1, a, p), (1, p, d), (1, d, b), (-1, a, b))
+        out.append((delta[cost_axis], delta, i, i))
+        for j in range(i + 1, n + 1):
+            if not profile.can_insert(i, j, dem):
+                break
+            c = seq[j]
+            e = seq[j + 1] if j + 1 < len(seq) else None
+            delta = add((1, a, p), (1, p, b), (-1, a, b), (1, c, d), (1, d, e), (-1, c, e))
+            out.append((delta[cost_axis], delta, i, j))
+    return out
+
+def insertion_options(routes, order, coords, graph=None, pair_cache=None, routing_mode="Economic",
+                      top_k=DEFAULT_TOP_K, now_h=None, metrics=None, profiles=None):
+    """Cheapest feasible ways to add one pickup & delivery order to an existing plan.
+
+    `order` is an order dict (pickup, delivery, demand, optional time_limit_hrs
+    and id), its deadline on the plan's clock. Every position pair on every
+    route is priced from the pair cache (km for "Economic", hours for "Fast");
+    the cheapest ones that respect capacity are replayed on the compliance
+    timeline (breaks, daily rests, speed profiles) and kept if no order ends up
+    late that was on time before. Stops a vehicle has already left at `now_h`
+    (hours since departure) are not reopened. Returns at most top_k options,
+    cheapest first; an empty list means the plan needs a full re-solve.
+
+    `profiles` ({route index: LoadProfile}) caches the routes' load profiles
+    across calls; keep it in step with the plan through apply_insertion.
+    """
+    if not all(k in order for k in ("pickup", "delivery", "demand")):
+        raise ValueError("order needs pickup, delivery and demand")
+    for city in (order["pickup"], order["delivery"]):
+        if city not in coords:
+            raise ValueError(f"unknown city {city!r}")
+    with collect(metrics):
+        if graph is None:
+            with stage("build_graph"):
+                graph = build_graph(coords, index_path=ROAD_INDEX_FILE, network_path=ROAD_NETWORK_FILE)
+        pair_cache = {} if pair_cache is None else pair_cache
+        profiles = {} if profiles is None else profiles
+        used_ids = [s.get("order_id") for r in routes for s in r.get("traseu", [])]
+        oid = order.get("id", max((i for i in used_ids if isinstance(i, int)), default=0) + 1)
+        new_order = {"id": oid, "pickup": order["pickup"], "delivery": order["delivery"],
+                     "demand": order["demand"], "time_limit_hrs": order.get("time_limit_hrs", MAX_TIME_LIMIT)}
+
+        def lengths(a, b):
+            return (0.0, 0.0) if a == b else _pair_lengths(graph, coords, a, b, pair_cache)
+
+        cost_axis = 1 if routing_mode in ("Timp minim", "Fast") else 0
+        with stage("insertion_price"):
+            cands, shapes = [], {}
+            for r, route in enumerate(routes):
+                if not route.get("traseu"):
+                    continue
+                idx, cities, end = shapes[r] = _route_shape(route)
+                if r not in profiles:
+                    profiles[r] = route_profile(route)[1]
+                cands += [(c, r, delta, i, j)
+                          for c, delta, i, j in _candidates(route, idx, cities, end, new_order, profiles[r],
+                                                            lengths, cost_axis, now_h)]
+            cands.sort(key=lambda x: x[0])
+            set_value("insertion_candidates", len(cands))
+
+        options, late_before = [], {}
+        with stage("insertion_check"):
+            for cost, r, delta, i, j in cands[:MAX_CHECKED_INSERTIONS]:
+                route = routes[r]
+                if r not in late_before:
+                    late_before[r] = _late_orders(route)
+                idx, _, end = shapes[r]
+                cand = dict(route, traseu=[dict(s) for s in
+                                           _candidate_steps(graph, coords, route, idx, end, new_order, i, j)])
+                incr("insertion_checked")
+                if _late_orders(cand) - late_before[r]:
+                    continue
+                stamp_loads([cand])
+                veh = route.get("vehicul")
+                options.append({
+                    "route_index": r,
+                    "vehicle": veh.get("nume") if isinstance(veh, dict) else veh,
+                    "unitate": route.get("unitate"),
+                    "order_id": oid,
+                    "demand": new_order["demand"],
+                    "pickup_after_stop": i,
+                    "delivery_after_stop": j,
+                    "delta_cost": cost,
+                    "delta_km": delta[0],
+                    "delta_h": delta[1],
+                    "route": cand,
+                })
+                if len(options) >= top_k:
+                    break
+        set_value("insertion_options", len(options))
+    return options
+
+def apply_insertion(routes, option, profiles=None):
+    """Plan with the option's route in place of the one it was computed from.
+
+    A cached load profile of that route (see insertion_options) is updated
+    with the inserted order rather than rebuilt from the steps.
+    """
+    out = list(routes)
+    r = option["route_index"]
+    out[r] = option["route"]
+    if profiles is not None and r in profiles:
+        profiles[r] = profiles[r].insert(option["pickup_after_stop"], option["delivery_after_stop"],
+                                         float(option["demand"]))
+    return out
@@ -0,0 +1,109 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+__all__ = ["new_metrics", "collect", "stage", "incr", "set_value", "current", "ProfilingBusy"]
+
+# constants
+PROFILE_TOP_N = 25                 # rows kept from the cProfile report
+PROFILE_SORT_KEY = "cumulative"
+TRACEMALLOC_TOP_N = 10             # allocation sites kept from the snapshot
+
+_local = threading.local()
+_process_tools = threading.Lock()  # held while cProfile / tracemalloc (process-wide) are in use
+
+class ProfilingBusy(RuntimeError):
+    """Raised when profile / trace_memory is asked for while another collector is using them."""
+
+def new_metrics():
+    # stages: seconds per stage (summed if entered more than once)
+    # counters: integer event counts, values: free-form facts (nodes, vehicles used, ...)
+    return {"stages": {}, "counters": {}, "values": {}}
+
+def current():
+    """Metrics dict being collected on this thread, or None."""
+    return getattr(_local, "metrics", None)
+
+@contextmanager
+def collect(metrics=None, profile=False, trace_memory=False):
+    """Make `metrics` the active collector for the enclosed block (per thread).
+
+    Metrics are per thread, but the profiler and tracemalloc are process-wide:
+    only one collector at a time (on any thread, nested ones included) may ask
+    for `profile` / `trace_memory`; the others raise ProfilingBusy.
+    """
+    exclusive = bool(profile or trace_memory)
+    if exclusive and not _process_tools.acquire(blocking=False):
+        raise ProfilingBusy("profile / trace_memory already in use by another solve in this process")
+    try:
+        with _collect(metrics, profile, trace_memory) as m:
+            yield m
+    finally:
+        if exclusive:
+            _process_tools.release()
+
+@contextmanager
+def _collect(metrics, profile, trace_memory):
+    metrics = new_metrics() if metrics is None else metrics
+    for k in ("stages", "counters", "values"):
+        metrics.setdefault(k, {})
+
+    prev = current()
+    _local.metrics = metrics
+
+    prof = cProfile.Profile() if profile else None
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    if prof:
+        prof.enable()
+    try:
+        yield metrics
+    finally:
+        if prof:
+            prof.disable()
+        metrics["values"]["wall_seconds"] = time.perf_counter() - t0
+        if prof:
+            out = io.StringIO()
+            pstats.Stats(prof, stream=out).sort_stats(PROFILE_SORT_KEY).print_stats(PROFILE_TOP_N)
+            metrics["profile"] = out.getvalue()
+        if trace_memory and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            snap = tracemalloc.take_snapshot()
+            metrics["memory"] = {
+                "peak_bytes": peak,
+                "top": [str(s) for s in snap.statistics("lineno")[:TRACEMALLOC_TOP_N]],
+            }
+            if started_tracing:
+                tracemalloc.stop()
+        _local.metrics = prev
+
+@contextmanager
+def stage(name):
+    """Time a named stage into the active collector (no-op when none is active)."""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = metrics["stages"]
+        stages[name] = stages.get(name, 0.0) + (time.perf_counter() - t0)
+
+def incr(name, n=1):
+    metrics = current()
+    if metrics is not None:
+        counters = metrics["counters"]
+        counters[name] = counters.get(name, 0) + n
+
+def set_value(name, value):
+    metrics = current()
+    if metrics is not None:
+        metrics["values"][name] = value
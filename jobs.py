@@ -0,0 +1,114 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ["JobRunner", "QueueFull"]
+
+# constants
+DEFAULT_WORKERS = 4
+FINISHED_JOB_TTL_SECONDS = 3600    # finished jobs are forgotten after this long
+ACTIVE_STATES = ("queued", "running")
+
+class QueueFull(Exception):
+    """Raised by JobRunner.submit when the pending-job limit is reached."""
+
+class JobRunner:
+    """Runs solves on a background thread pool and keeps their state by session.
+
+    The submitted callable is called as fn(*args, progress=..., cancel_event=..., **kwargs):
+    `progress(dict)` merges into the job's progress, `cancel_event` is set on cancel.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_pending=None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="solve")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+    def submit(self, session_id, fn, *args, **kwargs):
+        with self._lock:
+            self._purge()
+            if self.max_pending is not None and self.pending() >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs already waiting")
+            job_id = uuid.uuid4().hex
+            job = {
+                "id": job_id, "session": session_id, "state": "queued",
+                "progress": {}, "result": None, "error": None,
+                "submitted": time.time(), "started": None, "finished": None,
+                "_cancel": threading.Event(), "_future": None,
+            }
+            self._jobs[job_id] = job
+        job["_future"] = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job, fn, args, kwargs):
+        if job["_cancel"].is_set():
+            job["state"] = "cancelled"
+            job["finished"] = time.time()
+            return
+        job["state"] = "running"
+        job["started"] = time.time()
+
+        def progress(update):
+            job["progress"] = {**job["progress"], **update, "elapsed": time.time() - job["started"]}
+
+        try:
+            job["result"] = fn(*args, progress=progress, cancel_event=job["_cancel"], **kwargs)
+            job["state"] = "cancelled" if job["_cancel"].is_set() else "done"
+        except Exception as e:
+            if job["_cancel"].is_set():
+                job["state"] = "cancelled"   # the job gave up on its cancel event (e.g. SolveCancelled)
+            else:
+                job["error"] = f"{type(e).__name__}: {e}"
+                job["state"] = "failed"
+        finally:
+            job["finished"] = time.time()
+
+    def status(self, job_id):
+        """Public snapshot of a job, or None if unknown."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes or `timeout` passes; returns its status."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        try:
+            job["_future"].result(timeout=timeout)
+        except Exception:
+            pass  # timeout or cancellation; the state says which
+        return self.status(job_id)
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or job["state"] not in ACTIVE_STATES:
+            return False
+        job["_cancel"].set()
+        fut = job["_future"]
+        if fut is not None and fut.cancel():
+            # never started: finish it here
+            job["state"] = "cancelled"
+            job["finished"] = time.time()
+        return True
+
+    def jobs_for(self, session_id):
+        return [self.status(j) for j, job in list(self._jobs.items()) if job["session"] == session_id]
+
+    def pending(self):
+        return sum(1 for job in list(self._jobs.values()) if job["state"] in ACTIVE_STATES)
+
+    def _purge(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job["finished"] and now - job["finished"] > FINISHED_JOB_TTL_SECONDS:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+        self._pool.shutdown(wait=wait)
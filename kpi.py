@@ -0,0 +1,152 @@
+import numpy as np
+from timeline import (SERVICE_TIME, DRIVER_BREAK_, BREAK_WINDOW, SINGLE_DRIVER_DAILY_LIMIT,
+                      CREW_DRIVER_DAILY_LIMIT, DAILY_REST)
+
+__all__ = ["evaluate_routes", "score_plans", "plan_cost", "KPI_FIELDS"]
+
+# constants
+KPI_FIELDS = ("distance_km", "drive_h", "service_h", "rest_h", "duration_h", "lateness_h", "late_stops",
+              "utilization")
+SERVICE_STEP_TYPES = ("pickup", "delivery")
+
+def _seg_cumsum(x, first):
+    # cumulative sum restarted at each segment start (`first`: index of every segment's first element)
+    cs = np.cumsum(x)
+    base = np.r_[0.0, cs[first[1:] - 1]]
+    seg = np.repeat(np.arange(len(first)), np.diff(np.r_[first, len(x)]))
+    return cs - base[seg]
+
+def _score(leg_km, leg_h, leg_delta, leg_deadline, leg_service, leg_route, route_cap, route_crew):
+    """Per-route KPI arrays from flat per-leg arrays (legs of one route contiguous, in order).
+
+    Arrival times include an estimate of the tachograph rests (a 45 min break
+    per BREAK_WINDOW h driven, a daily rest per daily driving limit); the exact
+    replay is timeline.build_timeline.
+    """
+    n_routes = len(route_cap)
+    if len(leg_km) == 0:
+        zeros = np.zeros(n_routes)
+        return {k: zeros.copy() for k in KPI_FIELDS}
+    first = np.flatnonzero(np.r_[True, leg_route[1:] != leg_route[:-1]])
+
+    service = np.where(leg_service, SERVICE_TIME, 0.0)
+    drive_cum = _seg_cumsum(leg_h, first)
+    # service at a stop delays the arrival at the next one
+    service_before = _seg_cumsum(service, first) - service
+    daily_limit = np.where(route_crew, CREW_DRIVER_DAILY_LIMIT, SINGLE_DRIVER_DAILY_LIMIT)[leg_route]
+    rest_cum = np.floor(drive_cum / BREAK_WINDOW) * DRIVER_BREAK_ + np.floor(drive_cum / daily_limit) * DAILY_REST
+    arrival = drive_cum + service_before + rest_cum
+    late = np.where(leg_service, np.maximum(arrival - leg_deadline, 0.0), 0.0)
+
+    # load carried on each leg: demand picked up (and not yet delivered) before it
+    load_after = _seg_cumsum(leg_delta, first)
+    load_on_leg = load_after - leg_delta
+
+    last = np.r_[first[1:], len(leg_km)] - 1
+    km = np.bincount(leg_route, weights=leg_km, minlength=n_routes)
+    drive = np.bincount(leg_route, weights=leg_h, minlength=n_routes)
+    svc = np.bincount(leg_route, weights=service, minlength=n_routes)
+    rest = np.zeros(n_routes)
+    rest[leg_route[last]] = rest_cum[last]
+    carried = np.bincount(leg_route, weights=load_on_leg * leg_km, minlength=n_routes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        util = np.where(route_cap * km > 0, carried / (route_cap * km), 0.0)
+    return {
+        "distance_km": km,
+        "drive_h": drive,
+        "service_h": svc,
+        "rest_h": rest,
+        "duration_h": drive + svc + rest,
+        "lateness_h": np.bincount(leg_route, weights=late, minlength=n_routes),
+        "late_stops": np.bincount(leg_route, weights=(late > 0).astype(float), minlength=n_routes),
+        "utilization": util,
+    }
+
+def _fleet(per_route, route_cap, route_plan=None, n_plans=1):
+    # plan totals; utilization is weighted by capacity-km
+    plan = np.zeros(len(route_cap), dtype=int) if route_plan is None else route_plan
+    out = {k: np.bincount(plan, weights=per_route[k], minlength=n_plans)
+           for k in KPI_FIELDS if k != "utilization"}
+    cap_km = np.bincount(plan, weights=route_cap * per_route["distance_km"], minlength=n_plans)
+    carried = np.bincount(plan, weights=per_route["utilization"] * route_cap * per_route["distance_km"],
+                          minlength=n_plans)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["utilization"] = np.where(cap_km > 0, carried / cap_km, 0.0)
+    out["vehicles_used"] = np.bincount(plan, weights=(per_route["distance_km"] > 0).astype(float), minlength=n_plans)
+    return out
+
+def evaluate_routes(routes):
+    """KPIs of a solved plan (solve_vrp routes): {"vehicles": [...], "fleet": {...}}.
+
+    Reads the distance / duration each step already carries, so no graph or
+    matrix is needed; deadlines are the steps' `time_limit`.
+    """
+    km, hours, delta, deadline, service, route_id = [], [], [], [], [], []
+    caps, crews, names = [], [], []
+    for r, route in enumerate(routes):
+        veh = route.get("vehicul", {})
+        if not isinstance(veh, dict):
+            veh = {"nume": str(veh)}
+        names.append(veh.get("nume", f"Vehicle {r+1}"))
+        caps.append(float(veh.get("capacitate", 0) or 0))
+        crews.append(bool(veh.get("echipaj", False)))
+        for step in route.get("traseu", [])[1:]:
+            tip = step.get("tip")
+            q = float(step.get("demand", 0) or 0)
+            tl = step.get("time_limit")
+            km.append(float(step.get("distanta", 0) or 0))
+            hours.append(float(step.get("durata", 0) or 0))
+            delta.append(q if tip == "pickup" else (-q if tip == "delivery" else 0.0))
+            deadline.append(float(tl) if tip == "delivery" and isinstance(tl, (int, float)) else np.inf)
+            service.append(tip in SERVICE_STEP_TYPES)
+            route_id.append(r)
+    route_cap = np.array(caps, dtype=float)
+    per_route = _score(np.array(km, dtype=float), np.array(hours, dtype=float), np.array(delta, dtype=float),
+                       np.array(deadline, dtype=float), np.array(service, dtype=bool),
+                       np.array(route_id, dtype=int), route_cap, np.array(crews, dtype=bool))
+    fleet = _fleet(per_route, route_cap)
+    vehicles = [{"vehicle": name, **{k: float(per_route[k][r]) for k in KPI_FIELDS}}
+                for r, name in enumerate(names)]
+    return {"vehicles": vehicles, "fleet": {k: float(v[0]) for k, v in fleet.items()}}
+
+def plan_cost(routes, routing_mode):
+    """Total cost in the unit the solver minimised: driving hours for "Fast", km otherwise."""
+    fleet = evaluate_routes(routes)["fleet"]
+    return fleet["drive_h"] if routing_mode in ("Timp minim", "Fast") else fleet["distance_km"]
+
+def score_plans(dist_km, time_h, plans):
+    """Fleet KPIs of many candidate plans at once, from precomputed matrices.
+
+    `plans`: list of plans; a plan is a list of routes; a route is a dict with
+    `cities` (city-index sequence, start yard first), `delta` (signed load
+    change at each of those cities), optional `deadline` (hours, inf = none),
+    `service` (bool per city), `capacity` and `crew`. Returns {field: array
+    with one value per plan}, fields as KPI_FIELDS plus vehicles_used.
+    """
+    D = np.asarray(dist_km, dtype=float)
+    T = np.asarray(time_h, dtype=float)
+    frm, to, delta, deadline, service, leg_route = [], [], [], [], [], []
+    caps, crews, route_plan = [], [], []
+    r = 0
+    for p, plan in enumerate(plans):
+        for route in plan:
+            cities = route["cities"]
+            n = len(cities) - 1
+            if n > 0:
+                frm.extend(cities[:-1])
+                to.extend(cities[1:])
+                delta.extend(route["delta"][1:])
+                deadline.extend(route.get("deadline", [np.inf] * len(cities))[1:])
+                service.extend(route["service"][1:])
+                leg_route.extend([r] * n)
+            caps.append(route.get("capacity", 0))
+            crews.append(route.get("crew", False))
+            route_plan.append(p)
+            r += 1
+    frm = np.array(frm, dtype=int)
+    to = np.array(to, dtype=int)
+    route_cap = np.array(caps, dtype=float)
+    per_route = _score(D[frm, to], T[frm, to], np.array(delta, dtype=float), np.array(deadline, dtype=float),
+                       np.array(service, dtype=bool), np.array(leg_route, dtype=int), route_cap,
+                       np.array(crews, dtype=bool))
+    return _fleet(per_route, route_cap, np.array(route_plan, dtype=int), len(plans))
@@ -0,0 +1,126 @@
+__all__ = ["LoadProfile", "route_profile", "stamp_loads"]
+
+# constants
+LOAD_STEP_TYPES = ("pickup", "delivery")
+
+def _step_delta(step):
+    q = float(step.get("demand", 0) or 0)
+    tip = step.get("tip")
+    return q if tip == "pickup" else (-q if tip == "delivery" else 0.0)
+
+class LoadProfile:
+    """Load on board along one route, kept as prefix-sum arrays.
+
+    Positions are stops: 0 is the start yard, k is the k-th pickup / delivery.
+    `loads[k]` is the load when leaving stop k. Prefix / suffix maxima and a
+    sparse table of range maxima make every move check below O(1); applying a
+    move splices the load array and re-indexes it in O(n log n).
+    """
+
+    def __init__(self, deltas, capacity=float("inf")):
+        loads = [0.0]
+        for q in deltas:
+            loads.append(loads[-1] + q)
+        self._set(loads, capacity)
+
+    @classmethod
+    def _from_loads(cls, loads, capacity):
+        profile = cls.__new__(cls)
+        profile._set(loads, capacity)
+        return profile
+
+    def _set(self, loads, capacity):
+        self.capacity = float(capacity)
+        self.loads = loads
+        n = len(loads)
+        self._pmax = list(loads)
+        self._smax = list(loads)
+        for k in range(1, n):
+            self._pmax[k] = max(self._pmax[k - 1], loads[k])
+        for k in range(n - 2, -1, -1):
+            self._smax[k] = max(self._smax[k + 1], loads[k])
+        # sparse table: _table[p][k] = max(loads[k : k + 2**p])
+        self._table = [loads]
+        width = 1
+        while 2 * width <= n:
+            prev = self._table[-1]
+            self._table.append([max(prev[k], prev[k + width]) for k in range(n - 2 * width + 1)])
+            width *= 2
+
+    def __len__(self):
+        return len(self.loads)
+
+    @property
+    def peak(self):
+        return self._pmax[-1]
+
+    @property
+    def overloaded(self):
+        return self.peak > self.capacity
+
+    def range_max(self, i, j):
+        """Highest load leaving any stop i..j (inclusive); -inf for an empty range."""
+        if i > j:
+            return float("-inf")
+        p = (j - i + 1).bit_length() - 1
+        row = self._table[p]
+        return max(row[i], row[j - (1 << p) + 1])
+
+    def _outside(self, i, j):
+        # highest load outside stops i..j
+        before = self._pmax[i - 1] if i > 0 else float("-inf")
+        after = self._smax[j + 1] if j + 1 < len(self.loads) else float("-inf")
+        return max(before, after)
+
+    def can_insert(self, i, j, demand):
+        """Pickup right after stop i and its delivery right after stop j (i <= j).
+
+        Only the loads on board with the new order change, so only they are
+        checked: a stop already over capacity elsewhere (a forced order) does
+        not block the move.
+        """
+        return self.range_max(i, j) + demand <= self.capacity
+
+    def can_remove(self, a, b, demand):
+        """Whether the whole route is within capacity once the order at stops a < b is dropped."""
+        return max(self._outside(a, b - 1), self.range_max(a, b - 1) - demand) <= self.capacity
+
+    def can_swap(self, a, b, old_demand, new_demand):
+        """Put an order of `new_demand` on the pickup / delivery slots a < b of one of `old_demand`."""
+        return self.range_max(a, b - 1) + new_demand - old_demand <= self.capacity
+
+    def insert(self, i, j, demand):
+        """Profile after the insertion checked by can_insert."""
+        l = self.loads
+        return LoadProfile._from_loads(l[:i + 1] + [x + demand for x in l[i:j + 1]] + l[j:], self.capacity)
+
+    def remove(self, a, b):
+        """Profile after dropping the stops a < b (the pickup and delivery of one order)."""
+        l = self.loads
+        q = l[a] - l[a - 1]
+        return LoadProfile._from_loads(l[:a] + [x - q for x in l[a + 1:b]] + l[b + 1:], self.capacity)
+
+def route_profile(route):
+    """(stop step indices, LoadProfile) of a solved route; stop 0 is the departure."""
+    steps = route.get("traseu", [])
+    idx = [0] + [k for k in range(1, len(steps)) if steps[k].get("tip") in LOAD_STEP_TYPES]
+    veh = route.get("vehicul") if isinstance(route.get("vehicul"), dict) else {}
+    cap = veh.get("capacitate")
+    return idx, LoadProfile([_step_delta(steps[k]) for k in idx[1:]],
+                            float("inf") if cap is None else cap)
+
+def stamp_loads(routes):
+    """Write the load on board when leaving each step into the steps (`load`), in place.
+
+    Returns the number of routes whose load goes over the vehicle capacity.
+    """
+    over = 0
+    for route in routes:
+        idx, profile = route_profile(route)
+        s = 0
+        for k, step in enumerate(route.get("traseu", [])):
+            if s + 1 < len(idx) and k == idx[s + 1]:
+                s += 1
+            step["load"] = profile.loads[s]
+        over += profile.overloaded
+    return over
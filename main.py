@@ -1,9 +1,17 @@
 import streamlit as st
 from graph_builder import build_graph
 from vrp_solver import solve_vrp
+from horizon import plan_rolling_horizon
 from map_view import draw_initial_map, draw_route_map
 from table_view import draw_table
+from instrumentation import collect
+from jobs import JobRunner
+from portfolio import default_worker_count
+from orders import CityTable, OrderBook, read_orders
+from snapshot import dumps_snapshot, read_scenario, SNAPSHOT_SUFFIX
 import json
+import time
+import uuid
 
 # constants
 DEFAULT_VEHICLE_NAME = "Truck"
@@ -12,6 +20,10 @@ VEHICLE_CAPACITY_STEP_KG = 100
 DEFAULT_VEHICLE_COUNT = 1
 DEFAULT_ORDER_DEMAND_KG = 1000
 DEFAULT_TIME_LIMIT_H = 24
+DEFAULT_YARD_LABEL = "(Depot)"
+DEFAULT_DEPARTURE_HOUR = 8
+JOB_POLL_SECONDS = 1.0
+SOLVER_WORKERS = 4
 
 def load_coordinates(path):
     with open(path, encoding="utf-8") as f:
@@ -21,6 +33,18 @@ def load_road_data(path):
     with open(path, encoding="utf-8") as f:
         return json.load(f)
 
+@st.cache_resource
+def get_job_runner():
+    # one pool per server process, shared by all sessions and surviving reruns
+    return JobRunner(max_workers=SOLVER_WORKERS)
+
+def solve_job(progress=None, cancel_event=None, rolling_horizon=False, **kwargs):
+    metrics = {}
+    planner = plan_rolling_horizon if rolling_horizon else solve_vrp
+    routes, polylines, total_cost = planner(metrics=metrics, progress=progress,
+                                            cancel_event=cancel_event, **kwargs)
+    return {"routes": routes, "polylines": polylines, "cost": total_cost, "metrics": metrics}
+
 st.set_page_config(page_title="Delivery Route Optimization", layout="wide")
 
 # state
@@ -42,11 +66,24 @@ if "routes_generated" not in st.session_state:
     st.session_state.routes_generated = False
 if "allow_split" not in st.session_state:
     st.session_state.allow_split = True
+if "last_metrics" not in st.session_state:
+    st.session_state.last_metrics = {}
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
+if "solve_requested" not in st.session_state:
+    st.session_state.solve_requested = False
+if "order_book" not in st.session_state:
+    st.session_state.order_book = None    # imported CSV / JSON Lines orders (columnar)
+
+runner = get_job_runner()
 
 # data
 city_coords = load_coordinates("coords.json")
 road_data = load_road_data("roads.json")
 cities = [c for c, v in city_coords.items() if v.get("visible", False)]
+city_table = CityTable.from_coords(city_coords)
 placeholder = "Select from the list or type"
 cities_placeholder = [placeholder] + cities
 
@@ -66,6 +103,10 @@ with st.sidebar.form("fleet_form", clear_on_submit=False):
         v_cap = st.number_input("Capacity (kg)", min_value=1, value=int(vdata['capacitate']), step=VEHICLE_CAPACITY_STEP_KG)
         v_ech = st.checkbox("Crew of 2 drivers?", value=vdata.get('echipaj', False))
         v_count = st.number_input("Vehicle number of this type", min_value=1, value=int(vdata['numar']))
+        yard_opts = [DEFAULT_YARD_LABEL] + cities
+        v_yard = st.selectbox("Home yard", yard_opts,
+                              index=yard_opts.index(vdata['start_city']) if vdata.get('start_city') in yard_opts else 0)
+        v_open = st.checkbox("Open route (no return to yard)", value=vdata.get('open_route', False))
         label = "Save changes"
         cancel = st.form_submit_button("Cancel edit")
         if cancel:
@@ -77,6 +118,8 @@ with st.sidebar.form("fleet_form", clear_on_submit=False):
         v_cap = st.number_input("Capacity (kg)", min_value=1, value=DEFAULT_VEHICLE_CAPACITY_KG, step=VEHICLE_CAPACITY_STEP_KG)
         v_ech = st.checkbox("Crew of 2 drivers?")
         v_count = st.number_input("Vehicle number of this type", min_value=1, value=DEFAULT_VEHICLE_COUNT)
+        v_yard = st.selectbox("Home yard", [DEFAULT_YARD_LABEL] + cities, index=0)
+        v_open = st.checkbox("Open route (no return to yard)")
         label = "Add vehicle"
 
     save_v = st.form_submit_button(label)
@@ -88,6 +131,10 @@ with st.sidebar.form("fleet_form", clear_on_submit=False):
             "echipaj": v_ech,
             "numar": v_count
         }
+        if v_yard != DEFAULT_YARD_LABEL:
+            vehicul_nou["start_city"] = v_yard
+        if v_open:
+            vehicul_nou["open_route"] = True
         if st.session_state.edit_vehicle_index != -1:
             st.session_state.vehicle_profiles[st.session_state.edit_vehicle_index] = vehicul_nou
             st.session_state.edit_vehicle_index = -1
@@ -104,36 +151,40 @@ c1, c2 = st.sidebar.columns([1, 1])
 with c1:
     json_fleet = json.dumps(st.session_state.vehicle_profiles, indent=2)
     st.download_button("💾 Save fleet", data=json_fleet, file_name="fleet_config.json", mime="application/json", use_container_width=True)
+    fleet_snap = dumps_snapshot({"fleet": st.session_state.vehicle_profiles})
+    st.download_button("Save fleet snapshot", data=fleet_snap, file_name="fleet_config" + SNAPSHOT_SUFFIX, mime="application/octet-stream", use_container_width=True)
 with c2:
-    fleet_file = st.file_uploader("Upload fleet config", type="json", key="fleet_upld")
+    # snapshots and the older JSON configs (a bare list, or a scenario export)
+    fleet_file = st.file_uploader("Upload fleet config", type=["json", SNAPSHOT_SUFFIX[1:]], key="fleet_upld")
     if fleet_file:
-        st.session_state.vehicle_profiles = json.load(fleet_file)
+        loaded = read_scenario(fleet_file)
+        st.session_state.vehicle_profiles = loaded.get("fleet", []) if isinstance(loaded, dict) else loaded
         for v in st.session_state.vehicle_profiles:
             v['tahograf'] = True
         st.sidebar.success("Fleet loaded!")
 
 if st.session_state.vehicle_profiles:
     st.sidebar.markdown("### 🚚 Current fleet:")
-    count = 1
+    # one row per vehicle type; `numar` identical trucks share it
     for i, vp in enumerate(st.session_state.vehicle_profiles):
-        for k in range(vp['numar']):
-            c1, c2, c3 = st.sidebar.columns([8, 1, 1])
-            crew = "Crew 2" if vp.get("echipaj") else ""
-            tach = "Tachograph" if vp.get("tahograf") else ""
-            details = " | ".join(filter(None, [tach, crew]))
-            details = (" | " + details) if details else ""
-            c1.write(f"{count}. {vp['nume']} — {vp['capacitate']} kg{details}")
-            if c2.button("✏️", key=f"editv_{i}_{k}"):
-                st.session_state.edit_vehicle_index = i
-                st.session_state.routes_generated = False
-                st.rerun()
-            if c3.button("❌", key=f"delv_{i}_{k}"):
-                st.session_state.vehicle_profiles.pop(i)
-                st.session_state.routes_generated = False
-                if st.session_state.edit_vehicle_index == i:
-                    st.session_state.edit_vehicle_index = -1
-                st.rerun()
-            count += 1
+        c1, c2, c3 = st.sidebar.columns([8, 1, 1])
+        crew = "Crew 2" if vp.get("echipaj") else ""
+        tach = "Tachograph" if vp.get("tahograf") else ""
+        yard = f"Yard {vp['start_city']}" if vp.get("start_city") else ""
+        route_end = "Open route" if vp.get("open_route") else ""
+        details = " | ".join(filter(None, [tach, crew, yard, route_end]))
+        details = (" | " + details) if details else ""
+        c1.write(f"{i+1}. {vp['numar']} × {vp['nume']} — {vp['capacitate']} kg{details}")
+        if c2.button("✏️", key=f"editv_{i}"):
+            st.session_state.edit_vehicle_index = i
+            st.session_state.routes_generated = False
+            st.rerun()
+        if c3.button("❌", key=f"delv_{i}"):
+            st.session_state.vehicle_profiles.pop(i)
+            st.session_state.routes_generated = False
+            if st.session_state.edit_vehicle_index == i:
+                st.session_state.edit_vehicle_index = -1
+            st.rerun()
 
 # ------------------ Orders sidebar -----------------
 st.sidebar.header("📦 Orders (pickup & delivery)")
@@ -188,11 +239,31 @@ c1, c2 = st.sidebar.columns([1, 1])
 with c1:
     json_orders = json.dumps(st.session_state.requests, indent=2)
     st.download_button("💾 Save orders", data=json_orders, file_name="orders_config.json", mime="application/json", use_container_width=True)
+    orders_snap = dumps_snapshot({"orders": st.session_state.requests})
+    st.download_button("Save orders snapshot", data=orders_snap, file_name="orders_config" + SNAPSHOT_SUFFIX, mime="application/octet-stream", use_container_width=True)
 with c2:
-    orders_file = st.file_uploader("Upload orders config", type="json", key="orders_upld")
-    if orders_file:
-        st.session_state.requests = json.load(orders_file)
+    orders_file = st.file_uploader("Upload orders config", type=["json", SNAPSHOT_SUFFIX[1:], "jsonl", "csv"], key="orders_upld")
+    if orders_file and orders_file.name.lower().endswith((".json", SNAPSHOT_SUFFIX)):
+        loaded = read_scenario(orders_file)
+        st.session_state.requests = loaded.get("orders", []) if isinstance(loaded, dict) else loaded
         st.sidebar.success("Orders loaded!")
+    elif orders_file and st.session_state.get("order_book_file") != orders_file.file_id:
+        # large exports are streamed into the columnar order book, not kept as dicts
+        book, rejected, errors = read_orders(orders_file, city_table)
+        st.session_state.order_book = book
+        st.session_state.order_book_file = orders_file.file_id
+        st.session_state.routes_generated = False
+        st.sidebar.success(f"{len(book)} orders imported.")
+        if rejected:
+            st.sidebar.warning(f"{rejected} lines skipped:\n" + "\n".join(errors))
+
+if st.session_state.order_book:
+    c1, c2 = st.sidebar.columns([9, 1])
+    c1.write(f"📥 {len(st.session_state.order_book)} imported orders")
+    if c2.button("❌", key="del_book"):
+        st.session_state.order_book = None
+        st.session_state.routes_generated = False
+        st.rerun()
 
 if st.session_state.requests:
     st.sidebar.markdown("### 📦 Active Orders:")
@@ -213,20 +284,34 @@ if st.session_state.requests:
 # ---------------- routing mode ----------------
 st.sidebar.markdown("### Routing mode")
 mode = st.sidebar.radio("Select routing mode:", options=["Economic", "Fast"], horizontal=False)
+departure_hour = st.sidebar.number_input("Departure hour", min_value=0, max_value=23, value=DEFAULT_DEPARTURE_HOUR,
+                                         help="Roads with a speed profile use their time-of-day travel times.")
+rolling_horizon = st.sidebar.checkbox("Multi-day planning", value=False,
+                                      help="Plan day by day: trucks start each day where they ended the previous one.")
+parallel_search = st.sidebar.checkbox("Parallel search", value=False,
+                                      help="Run several solver processes with different strategies and keep the best plan.")
 st.sidebar.markdown("---")
+with st.sidebar.expander("🛠 Diagnostics", expanded=False):
+    show_debug = st.checkbox("Show solver metrics", value=False, key="show_debug")
+    profile_solve = st.checkbox("Profile solve (cProfile + tracemalloc)", value=False, key="profile_solve")
 gen_rute = st.sidebar.button("Generate routes", use_container_width=True)
 if gen_rute:
     st.session_state.routes_generated = True
+    st.session_state.solve_requested = True
     st.rerun()
 if st.sidebar.button("Reset", use_container_width=True):
     st.session_state.requests = []
     st.session_state.vehicle_profiles = []
+    st.session_state.order_book = None
     st.session_state.routes_generated = False
     st.session_state.last_routes = []
     st.session_state.last_cost = 0
     st.session_state.last_polylines = []
     st.session_state.edit_index = -1
     st.session_state.edit_vehicle_index = -1
+    if st.session_state.job_id:
+        runner.cancel(st.session_state.job_id)
+        st.session_state.job_id = None
     st.rerun()
 
 # main
@@ -236,64 +321,106 @@ if not start_city:
     draw_initial_map(city_coords, None)
     st.stop()
 
-if not st.session_state.requests or not st.session_state.vehicle_profiles:
+if not (st.session_state.requests or st.session_state.order_book) or not st.session_state.vehicle_profiles:
     st.info("Add at least one vehicle and one order to generate routes.")
     draw_initial_map(city_coords, start_city)
     st.stop()
 
+# all orders as one columnar book: sidebar orders first, imported ones after (stable order ids)
+book = OrderBook.from_requests(st.session_state.requests, city_table)
+if st.session_state.order_book:
+    book.extend(st.session_state.order_book)
+
 # split requests if divisible (keep stable order id)
-chunks = []
+max_cap = max((v['capacitate'] for v in st.session_state.vehicle_profiles), default=0)
 if st.session_state.allow_split:
-    for oid, r in enumerate(st.session_state.requests, start=1):
-        rem = r['demand']
-        max_cap = max((v['capacitate'] for v in st.session_state.vehicle_profiles), default=0)
-        part = 1
-        while rem > 0:
-            c = min(rem, max_cap)
-            rr = dict(r)
-            rr['demand'] = c
-            rr['id'] = oid
-            rr['part'] = part
-            chunks.append(rr)
-            rem -= c
-            part += 1
+    chunks = book.split(max_cap)
 else:
-    max_cap = max((v['capacitate'] for v in st.session_state.vehicle_profiles), default=0)
-    for oid, r in enumerate(st.session_state.requests, start=1):
-        if r['demand'] > max_cap:
-            st.error(f"Order {r['pickup']}→{r['delivery']} ({r['demand']}kg) exceeds the max capacity. Enable 'Divisible load' or add bigger vehicles.")
-            st.stop()
-        rr = dict(r)
-        rr['id'] = oid
-        chunks.append(rr)
-
-# expand fleet into actual physical units
-profile_expanded = []
-for vp in sorted(st.session_state.vehicle_profiles, key=lambda v: v['capacitate']):
-    for _ in range(vp['numar']):
-        profile_expanded.append(vp)
+    too_big = book.over_capacity(max_cap)
+    if too_big:
+        r = book[too_big[0]]
+        st.error(f"Order {r['pickup']}→{r['delivery']} ({r['demand']}kg) exceeds the max capacity. Enable 'Divisible load' or add bigger vehicles.")
+        st.stop()
+    chunks = book
+
+# fleet by vehicle type (the solver expands `numar` into physical units)
+fleet_types = sorted(st.session_state.vehicle_profiles, key=lambda v: v['capacitate'])
 
 # prioritize orders by time limit (urgent first)
-chunks = sorted(chunks, key=lambda x: x['time_limit_hrs'])
+chunks = chunks.sorted_by_deadline()
 
-# generate routes
-if st.session_state.routes_generated:
-    routes, polylines, total_cost = solve_vrp(
+# generate routes (in the background; this script run only submits and polls)
+if st.session_state.solve_requested:
+    st.session_state.solve_requested = False
+    if st.session_state.job_id:
+        runner.cancel(st.session_state.job_id)
+    st.session_state.job_id = runner.submit(
+        st.session_state.session_id, solve_job,
         start_city=start_city,
         pd_requests=chunks,
         coords=city_coords,
-        vehicle_profiles=profile_expanded,   # exact number of trucks
+        vehicle_profiles=fleet_types,        # types with their truck count
         routing_mode=mode,                   # "Fast" => time, "Economic" => distance
-        allow_split=st.session_state.allow_split
+        allow_split=st.session_state.allow_split,
+        departure_hour=departure_hour,
+        rolling_horizon=rolling_horizon,
+        portfolio_workers=default_worker_count() if parallel_search else None,
+        profile=profile_solve,
+        trace_memory=profile_solve
     )
 
-    # overwrite last result
-    st.session_state.last_routes = routes
-    st.session_state.last_polylines = polylines
-    st.session_state.last_cost = total_cost
+job = runner.status(st.session_state.job_id) if st.session_state.job_id else None
+if job and job["state"] in ("queued", "running"):
+    prog = job["progress"]
+    if job["state"] == "queued":
+        st.info("Solve queued, waiting for a free worker…")
+    else:
+        best = prog.get("objective")
+        st.info(f"Solving… {prog.get('solutions', 0)} solutions found"
+                + (f", best objective {best}" if best is not None else "")
+                + f" ({prog.get('elapsed', time.time() - job['started']):.0f}s)")
+        for k, stops in enumerate(prog.get("routes") or [], 1):
+            if stops:
+                st.caption(f"Vehicle {k}: " + " → ".join(stops))
+    if st.button("Cancel solve"):
+        runner.cancel(job["id"])
+    draw_initial_map(city_coords, start_city)
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
+elif job:
+    if job["result"]:
+        # overwrite last result
+        st.session_state.last_routes = job["result"]["routes"]
+        st.session_state.last_polylines = job["result"]["polylines"]
+        st.session_state.last_cost = job["result"]["cost"]
+        st.session_state.last_metrics = job["result"]["metrics"]
+    if job["state"] == "failed":
+        st.error(f"Solve failed: {job['error']}")
+    elif job["state"] == "cancelled":
+        st.warning("Solve cancelled." + (" Showing the best plan found so far." if job["result"] else ""))
+    st.session_state.job_id = None
+
+if st.session_state.routes_generated and st.session_state.last_routes:
+    metrics = st.session_state.last_metrics
+    render_metrics = {}
+    yards = [start_city] + [vp['start_city'] for vp in st.session_state.vehicle_profiles if vp.get('start_city')]
+    with collect(render_metrics):
+        draw_route_map(city_coords, yards, st.session_state.last_polylines)
+        # table computes per-delivery windows from steps
+        draw_table(st.session_state.last_routes, st.session_state.last_cost, None)
+    metrics["render"] = render_metrics
 
-    draw_route_map(city_coords, start_city, polylines)
-    # table computes per-delivery windows from steps
-    draw_table(st.session_state.last_routes, st.session_state.last_cost, None)
+    if show_debug:
+        with st.expander("🛠 Solver diagnostics", expanded=True):
+            stages = {**metrics.get("stages", {}), **render_metrics.get("stages", {})}
+            st.dataframe(
+                [{"Stage": k, "Seconds": round(v, 4)} for k, v in stages.items()],
+                use_container_width=True, hide_index=True
+            )
+            st.json({"counters": metrics.get("counters", {}), "values": metrics.get("values", {})})
+            if metrics.get("memory"):
+                st.json(metrics["memory"])
+            if metrics.get("profile"):
+                st.code(metrics["profile"], language="text")
 else:
     draw_initial_map(city_coords, start_city)
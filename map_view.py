@@ -14,10 +14,12 @@ PATH_WEIGHT = 5
 ANTPATH_DELAY_MS = 800
 
 def _add_markers(m, city_coords, start_city):
+    # start_city: the depot name, or a collection of yard names (multi-depot fleets)
+    depots = {start_city} if isinstance(start_city, str) else set(start_city or [])
     for city, data in city_coords.items():
         if not data.get("visible", False):
             continue
-        icon_color = MARKER_DEPOT_COLOR if city == start_city else MARKER_NODE_COLOR
+        icon_color = MARKER_DEPOT_COLOR if city in depots else MARKER_NODE_COLOR
         folium.Marker(
             location=data["coords"],
             tooltip=city,
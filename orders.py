@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+from array import array
+
+__all__ = ["CityTable", "OrderBook", "read_orders"]
+
+# constants
+DEFAULT_TIME_LIMIT_H = 24
+MAX_REPORTED_ERRORS = 20           # rejected lines listed back to the user (the rest are only counted)
+
+def _whole_kg(value):
+    # demand in whole kg: the OR-Tools capacity dimension only takes integers
+    q = float(value)
+    if not q.is_integer():
+        raise ValueError(f"demand must be a whole number of kg, got {value!r}")
+    return int(q)
+
+def _deadline(value):
+    # hours; missing (None / empty cell) means the default, an explicit value must be positive
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return float(DEFAULT_TIME_LIMIT_H)
+    h = float(value)
+    if not h > 0:
+        raise ValueError(f"time_limit_hrs must be positive, got {value!r}")
+    return h
+
+class CityTable:
+    """Interned city names: each known city gets a small integer id."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self._id = {n: i for i, n in enumerate(self.names)}
+
+    @classmethod
+    def from_coords(cls, coords):
+        return cls(coords)
+
+    def id(self, name):
+        """Id of a city name; ValueError if it is not in the table."""
+        try:
+            return self._id[name.strip() if isinstance(name, str) else name]
+        except KeyError:
+            raise ValueError(f"unknown city {name!r}")
+
+    def __contains__(self, name):
+        return name in self._id
+
+class OrderBook:
+    """Orders stored column-wise: pickup id, delivery id, demand, deadline (+ order id, part).
+
+    Indexing yields a plain order dict built on demand, so an OrderBook can be
+    passed wherever a list of order dicts is expected (e.g. as solve_vrp's
+    `pd_requests`) without keeping one dict per order alive.
+    """
+
+    def __init__(self, cities):
+        self.cities = cities
+        self.pickup = array('I')
+        self.delivery = array('I')
+        self.demand = array('q')      # whole kg
+        self.deadline = array('d')
+        self.order_id = array('I')
+        self.part = array('I')        # 0 = order not split
+
+    def append(self, pickup, delivery, demand, deadline=DEFAULT_TIME_LIMIT_H, order_id=None, part=0):
+        """Add one order by city names (validated against the city table)."""
+        self._append_ids(self.cities.id(pickup), self.cities.id(delivery), demand, deadline,
+                         len(self) + 1 if order_id is None else order_id, part)
+
+    def _append_ids(self, p, d, demand, deadline, order_id, part):
+        self.pickup.append(p)
+        self.delivery.append(d)
+        self.demand.append(_whole_kg(demand))
+        self.deadline.append(float(deadline))
+        self.order_id.append(order_id)
+        self.part.append(part)
+
+    @classmethod
+    def from_requests(cls, requests, cities, first_id=1):
+        """Book from order dicts as the sidebar stores them."""
+        book = cls(cities)
+        for oid, r in enumerate(requests, start=first_id):
+            book.append(r['pickup'], r['delivery'], r['demand'], r.get('time_limit_hrs', DEFAULT_TIME_LIMIT_H), oid)
+        return book
+
+    def __len__(self):
+        return len(self.pickup)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        demand = self.demand[i]
+        order = {
+            "pickup": self.cities.names[self.pickup[i]],
+            "delivery": self.cities.names[self.delivery[i]],
+            "demand": demand,
+            "time_limit_hrs": self.deadline[i],
+            "id": self.order_id[i],
+        }
+        if self.part[i]:
+            order["part"] = self.part[i]
+        return order
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def extend(self, other):
+        """Append another book's orders, renumbering them after this book's ids."""
+        offset = max(self.order_id, default=0)
+        for i in range(len(other)):
+            self._append_ids(other.pickup[i], other.delivery[i], other.demand[i], other.deadline[i],
+                             other.order_id[i] + offset, other.part[i])
+        return self
+
+    def take(self, indices):
+        """New book with the orders at `indices`, in that order."""
+        out = OrderBook(self.cities)
+        for col in ("pickup", "delivery", "demand", "deadline", "order_id", "part"):
+            src = getattr(self, col)
+            getattr(out, col).extend(src[i] for i in indices)
+        return out
+
+    def sorted_by_deadline(self):
+        """Urgent orders first (stable)."""
+        return self.take(sorted(range(len(self)), key=self.deadline.__getitem__))
+
+    def over_capacity(self, max_cap):
+        """Indices of orders heavier than `max_cap`."""
+        return [i for i, q in enumerate(self.demand) if q > max_cap]
+
+    def split(self, max_cap):
+        """Orders cut into parts of at most `max_cap` (same order id, part 1, 2, ...)."""
+        if not max_cap >= 1:
+            raise ValueError(f"cannot split orders into parts of {max_cap} kg")
+        max_cap = int(max_cap)
+        out = OrderBook(self.cities)
+        for i in range(len(self)):
+            rem, part = self.demand[i], 1
+            while rem > 0:
+                c = min(rem, max_cap)
+                out._append_ids(self.pickup[i], self.delivery[i], c, self.deadline[i], self.order_id[i], part)
+                rem -= c
+                part += 1
+        return out
+
+def _rows(stream, fmt):
+    # (line number, raw dict or the parse error) pairs, read one line at a time
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for n, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield n, json.loads(line)
+                except ValueError as e:
+                    yield n, e
+    else:
+        raise ValueError(f"unsupported order format {fmt!r}")
+
+def read_orders(source, cities, fmt=None, first_id=1):
+    """Stream a CSV / JSON Lines order file into an OrderBook.
+
+    `source` is a path or a (text or binary) file object; `fmt` defaults to the
+    file extension. Rows need pickup, delivery and demand in whole kg
+    (time_limit_hrs is optional, positive when given). Invalid rows are
+    skipped; returns (book, rejected count, first MAX_REPORTED_ERRORS messages).
+    """
+    if isinstance(source, str):
+        fmt = fmt or source.rsplit(".", 1)[-1].lower()
+        with open(source, encoding="utf-8", newline="") as f:
+            return read_orders(f, cities, fmt, first_id)
+    fmt = fmt or getattr(source, "name", "").rsplit(".", 1)[-1].lower()
+    if isinstance(source.read(0), bytes):
+        source = io.TextIOWrapper(source, encoding="utf-8", newline="")
+
+    book = OrderBook(cities)
+    rejected, errors = 0, []
+    oid = first_id
+    for n, row in _rows(source, fmt):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            demand = _whole_kg(row["demand"])
+            deadline = _deadline(row.get("time_limit_hrs"))
+            if demand <= 0:
+                raise ValueError("demand must be positive")
+            book.append(row["pickup"], row["delivery"], demand, deadline, oid)
+            oid += 1
+        except (ValueError, KeyError, TypeError) as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"line {n}: " + (f"missing {e}" if isinstance(e, KeyError) else str(e)))
+    return book, rejected, errors
@@ -0,0 +1,172 @@
+import atexit
+import multiprocessing
+import os
+import pickle
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+__all__ = ["run_portfolio", "map_parallel", "default_worker_count", "stop_requested", "task_stop"]
+
+# constants
+MAX_DEFAULT_WORKERS = 8
+STOP_POLL_SECONDS = 0.5            # how often a running map checks its stop flag
+STOP_GRACE_SECONDS = 2.0           # how long stopped tasks get to hand back what they have
+STOP_SLOTS = 64                    # concurrent runs one pool can tell apart
+# pool processes never fork from the (multithreaded) caller
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_pools = {}                        # max_workers -> long-lived _Pool (calling process)
+_pools_lock = threading.Lock()
+_shared = {}                       # pool process: stop flags, data of the current run, slot of the current task
+
+def default_worker_count():
+    return max(1, min(MAX_DEFAULT_WORKERS, os.cpu_count() or 1))
+
+def _init(flags):
+    _shared["flags"] = flags
+
+def _call(worker, token, blob, slot, task):
+    # runs in a pool process: a run's data is unpickled once per process, not once per task
+    if _shared.get("token") != token:
+        _shared["data"] = pickle.loads(blob)
+        _shared["token"] = token
+    if _shared["flags"][slot]:
+        return None                # the run was stopped before this task started
+    _shared["slot"] = slot
+    try:
+        return worker(_shared["data"], task)
+    finally:
+        _shared["slot"] = None
+
+def stop_requested():
+    """True once the run of the task this pool process is working on has been stopped."""
+    slot = _shared.get("slot")
+    return slot is not None and bool(_shared["flags"][slot])
+
+class _TaskStop:
+    # threading.Event-like view of stop_requested(), for workers that take a cancel_event
+    def is_set(self):
+        return stop_requested()
+
+task_stop = _TaskStop()
+
+class _Pool:
+    """A long-lived process pool and the stop flags of the runs using it (one slot per run)."""
+
+    def __init__(self, max_workers):
+        ctx = multiprocessing.get_context(START_METHOD)
+        self.flags = ctx.RawArray('b', STOP_SLOTS)
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx,
+                                            initializer=_init, initargs=(self.flags,))
+        self.free = list(range(STOP_SLOTS))
+
+class _Run:
+    """One map / portfolio on a shared pool: its data (pickled once) and its stop flag."""
+
+    def __init__(self, worker, data, max_workers):
+        self.worker, self.max_workers = worker, max_workers
+        self.blob, self.token = pickle.dumps(data), uuid.uuid4().hex
+        self.stragglers = set()    # stopped tasks still running after their grace period
+        with _pools_lock:
+            pool = _pools.get(max_workers)
+            if pool is None:
+                pool = _pools[max_workers] = _Pool(max_workers)
+            if not pool.free:
+                raise RuntimeError(f"more than {STOP_SLOTS} parallel runs on one pool")
+            self.pool, self.slot = pool, pool.free.pop()
+            pool.flags[self.slot] = 0
+
+    def submit(self, task):
+        return self.pool.executor.submit(_call, self.worker, self.token, self.blob, self.slot, task)
+
+    def gather(self, futures, on_done, should_stop=None):
+        """Call on_done(future) as futures finish; False if should_stop() ended the wait early.
+
+        A stop is passed on to the workers (stop_requested()), which get
+        STOP_GRACE_SECONDS to hand back their results; tasks not started yet
+        are dropped.
+        """
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=STOP_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                on_done(fut)
+            if pending and should_stop is not None and should_stop():
+                self.pool.flags[self.slot] = 1
+                for fut in pending:
+                    fut.cancel()
+                finished, self.stragglers = wait(pending, timeout=STOP_GRACE_SECONDS)
+                for fut in finished:
+                    if not fut.cancelled():
+                        on_done(fut)
+                return False
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pool = self.pool
+        with _pools_lock:
+            if self.stragglers or (exc_type is not None and issubclass(exc_type, BrokenProcessPool)):
+                # tasks ignoring their stop flag, or a dead pool: leave it and start a fresh one next time
+                if _pools.get(self.max_workers) is pool:
+                    del _pools[self.max_workers]
+                pool.executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                pool.free.append(self.slot)
+
+def _shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+atexit.register(_shutdown_pools)
+
+def map_parallel(worker, data, tasks, max_workers=None, on_result=None, should_stop=None):
+    """`worker(data, task)` for every task in parallel processes; results in task order.
+
+    `on_result(done, total)` is called as tasks finish. Once `should_stop()` is
+    true, tasks not started yet are dropped and running ones are told to stop
+    (see stop_requested); results they do not hand back in time stay None.
+    """
+    tasks = list(tasks)
+    results = [None] * len(tasks)
+    with _Run(worker, data, max_workers or default_worker_count()) as run:
+        futures = {run.submit(t): i for i, t in enumerate(tasks)}
+        done = [0]
+        def on_done(fut):
+            results[futures[fut]] = fut.result()
+            done[0] += 1
+            if on_result is not None:
+                on_result(done[0], len(tasks))
+        run.gather(futures, on_done, should_stop)
+    return results
+
+def run_portfolio(worker, data, tasks_for_round, rounds=1, max_workers=None, on_round=None, should_stop=None):
+    """Run `worker(data, task)` in parallel processes, keeping the best result.
+
+    worker returns (objective, payload) or None; `tasks_for_round(r, best)`
+    lists the tasks of round r given the best (objective, payload) so far
+    (None before the first), which is how incumbents are exchanged between
+    rounds. `on_round(r, best)` is called after each round. Once `should_stop()`
+    is true the running round's workers are told to stop (see stop_requested)
+    and their best results so far still count. Returns the best result or None.
+    """
+    best = [None]
+    def on_done(fut):
+        res = fut.result()
+        if res is not None and (best[0] is None or res[0] < best[0][0]):
+            best[0] = res
+
+    with _Run(worker, data, max_workers or default_worker_count()) as run:
+        for r in range(rounds):
+            finished = run.gather([run.submit(t) for t in tasks_for_round(r, best[0])], on_done, should_stop)
+            if on_round is not None:
+                on_round(r, best[0])
+            if not finished or (should_stop is not None and should_stop()):
+                break
+    return best[0]
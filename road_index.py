@@ -0,0 +1,232 @@
+import hashlib
+import heapq
+import json
+
+__all__ = ["ContractionHierarchy", "build_road_index", "save_road_index", "load_road_index",
+           "graph_fingerprint"]
+
+# constants
+INDEX_FORMAT_VERSION = 1
+INDEX_WEIGHTS = ("distance", "duration")
+WITNESS_SETTLE_LIMIT = 60          # nodes settled per witness search (higher = fewer shortcuts, slower build)
+INF = float('inf')
+
+class ContractionHierarchy:
+    """Contraction hierarchy over an undirected weighted graph.
+
+    Built once from an edge list; answers point-to-point shortest-path lengths
+    and paths with a bidirectional upward Dijkstra over the contracted graph.
+    """
+
+    def __init__(self, nodes, edges=None):
+        # nodes: names; edges: [(a, b, weight)] (parallel edges keep the lightest)
+        self.nodes = list(nodes)
+        self._id = {n: i for i, n in enumerate(self.nodes)}
+        self._rank = []
+        self._up = []                  # up[u]: [(v, w)] with rank[v] > rank[u]
+        self._mid = {}                 # (u, v) -> middle node of a shortcut
+        if edges is not None:
+            self._build(edges)
+
+    @classmethod
+    def from_graph(cls, G, weight):
+        """Index a networkx graph on edge attribute `weight`."""
+        return cls(G.nodes, ((a, b, float(d.get(weight, 0) or 0.0)) for a, b, d in G.edges(data=True)))
+
+    # ---- preprocessing ----
+    def _build(self, edges):
+        n = len(self.nodes)
+        adj = [dict() for _ in range(n)]
+        for a, b, w in edges:
+            u, v = self._id[a], self._id[b]
+            if u != v and w < adj[u].get(v, INF):
+                adj[u][v] = adj[v][u] = w
+
+        contracted = [False] * n
+        depth = [0] * n
+        rank = [0] * n
+
+        def witness(src, skip, limit):
+            # bounded Dijkstra among uncontracted nodes, avoiding `skip`
+            dist = {src: 0.0}
+            heap = [(0.0, src)]
+            settled = 0
+            while heap and settled < WITNESS_SETTLE_LIMIT:
+                d, u = heapq.heappop(heap)
+                if d > limit:
+                    break
+                if d > dist[u]:
+                    continue
+                settled += 1
+                for x, w in adj[u].items():
+                    if x == skip or contracted[x]:
+                        continue
+                    nd = d + w
+                    if nd < dist.get(x, INF):
+                        dist[x] = nd
+                        heapq.heappush(heap, (nd, x))
+            return dist
+
+        def shortcuts(v):
+            nbrs = [(u, w) for u, w in adj[v].items() if not contracted[u]]
+            out = []
+            for i, (u, wu) in enumerate(nbrs):
+                rest = nbrs[i + 1:]
+                if not rest:
+                    break
+                dist = witness(u, v, wu + max(w for _, w in rest))
+                for x, wx in rest:
+                    if dist.get(x, INF) > wu + wx:
+                        out.append((u, x, wu + wx))
+            return out, len(nbrs)
+
+        def priority(v):
+            sc, deg = shortcuts(v)
+            return len(sc) - deg + depth[v], sc
+
+        heap = [(priority(v)[0], v) for v in range(n)]
+        heapq.heapify(heap)
+        order = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            prio, sc = priority(v)
+            if heap and prio > heap[0][0]:
+                # lazy update: priority went stale since it was queued
+                heapq.heappush(heap, (prio, v))
+                continue
+            for u, x, w in sc:
+                if w < adj[u].get(x, INF):
+                    adj[u][x] = adj[x][u] = w
+                    self._mid[(u, x)] = self._mid[(x, u)] = v
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+            for u in adj[v]:
+                if not contracted[u]:
+                    depth[u] = max(depth[u], depth[v] + 1)
+
+        self._rank = rank
+        self._up = [[(v, w) for v, w in adj[u].items() if rank[v] > rank[u]] for u in range(n)]
+
+    # ---- queries ----
+    def _search(self, s, t):
+        # (length, meeting node, parents) of the upward bidirectional search; length INF if no path
+        if s == t:
+            return 0.0, s, ({s: None}, {t: None})
+        dist = ({s: 0.0}, {t: 0.0})
+        parent = ({s: None}, {t: None})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        best, meet = INF, None
+        while heaps[0] or heaps[1]:
+            for side in (0, 1):
+                heap = heaps[side]
+                if not heap:
+                    continue
+                d, u = heapq.heappop(heap)
+                if d > dist[side][u]:
+                    continue
+                if d >= best:
+                    heap.clear()       # nothing left on this side can improve the best meeting
+                    continue
+                other = dist[1 - side].get(u)
+                if other is not None and d + other < best:
+                    best, meet = d + other, u
+                for v, w in self._up[u]:
+                    nd = d + w
+                    if nd < dist[side].get(v, INF):
+                        dist[side][v] = nd
+                        parent[side][v] = u
+                        heapq.heappush(heap, (nd, v))
+        return best, meet, parent
+
+    def _ids(self, source, target):
+        return self._id[source], self._id[target]
+
+    def length(self, source, target):
+        """Shortest-path length, or None when target is unreachable."""
+        best, _, _ = self._search(*self._ids(source, target))
+        return None if best == INF else best
+
+    def path(self, source, target):
+        """Shortest path as a list of node names, or None when unreachable."""
+        s, t = self._ids(source, target)
+        best, meet, parent = self._search(s, t)
+        if best == INF:
+            return None
+        up_half = []
+        u = meet
+        while u is not None:
+            up_half.append(u)
+            u = parent[0][u]
+        up_half.reverse()
+        down_half = []
+        u = parent[1][meet]
+        while u is not None:
+            down_half.append(u)
+            u = parent[1][u]
+        hops = up_half + down_half
+
+        # unpack shortcuts back into original edges
+        out = [hops[0]]
+        for a, b in zip(hops, hops[1:]):
+            stack = [(a, b)]
+            while stack:
+                x, y = stack.pop()
+                m = self._mid.get((x, y))
+                if m is None:
+                    out.append(y)
+                else:
+                    stack.append((m, y))
+                    stack.append((x, m))
+        return [self.nodes[i] for i in out]
+
+    # ---- serialization ----
+    def to_dict(self):
+        return {
+            "nodes": self.nodes,
+            "rank": self._rank,
+            "up": [[[v, w] for v, w in edges] for edges in self._up],
+            "mid": [[u, v, m] for (u, v), m in self._mid.items() if u < v],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        ch = cls(data["nodes"])
+        ch._rank = list(data["rank"])
+        ch._up = [[(v, w) for v, w in edges] for edges in data["up"]]
+        for u, v, m in data["mid"]:
+            ch._mid[(u, v)] = ch._mid[(v, u)] = m
+        return ch
+
+def graph_fingerprint(G):
+    """Hash of the graph's nodes and indexed edge weights (detects a stale index file)."""
+    edges = sorted(
+        (min(a, b), max(a, b), *(float(d.get(k, 0) or 0.0) for k in INDEX_WEIGHTS))
+        for a, b, d in G.edges(data=True)
+    )
+    payload = json.dumps([sorted(G.nodes), edges]).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+def build_road_index(G):
+    """One contraction hierarchy per weight in INDEX_WEIGHTS."""
+    return {w: ContractionHierarchy.from_graph(G, w) for w in INDEX_WEIGHTS}
+
+def save_road_index(index, path, fingerprint):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_FORMAT_VERSION, "fingerprint": fingerprint,
+                   "weights": {w: ch.to_dict() for w, ch in index.items()}}, f)
+
+def load_road_index(path, fingerprint=None):
+    """Index saved by save_road_index, or None if missing, unreadable or built for another graph."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_FORMAT_VERSION:
+        return None
+    if fingerprint is not None and data.get("fingerprint") != fingerprint:
+        return None
+    return {w: ContractionHierarchy.from_dict(d) for w, d in data["weights"].items()}
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import sys
+
+__all__ = ["compile_network", "save_network", "load_network", "network_fingerprint", "RoadNetwork"]
+
+# constants
+NETWORK_FORMAT_VERSION = 1
+MIN_SPEED_KMPH = 5                 # slower than this on an inter-city road is a data error
+MAX_SPEED_KMPH = 130               # legal limit for trucks is well below; anything above is a data error
+
+def _number(x):
+    try:
+        v = float(x)
+    except (TypeError, ValueError):
+        return None
+    return v if v == v else None   # NaN counts as missing
+
+class RoadNetwork:
+    """Validated road network: merged edges, issues found, component id per city.
+
+    `component[i]` is the connected component of `nodes[i]`; two cities are
+    reachable from each other iff their ids match. Cities without any valid
+    road get a component of their own.
+    """
+
+    def __init__(self, nodes, component, edges, issues):
+        self.nodes = list(nodes)
+        self.component = list(component)
+        self.edges = edges           # [(a, b, distance_km, duration_hours, speed_profile or None)]
+        self.issues = issues         # [{"issue", "from", "to", "detail"}]
+        self._id = {n: i for i, n in enumerate(self.nodes)}
+
+    def component_of(self, city):
+        """Component id of `city` (-1 if it is not a known city)."""
+        i = self._id.get(city)
+        return -1 if i is None else self.component[i]
+
+    def reachable(self, a, b):
+        ca = self.component_of(a)
+        return ca != -1 and ca == self.component_of(b)
+
+    def component_map(self):
+        return dict(zip(self.nodes, self.component))
+
+    def summary(self):
+        counts = {}
+        for issue in self.issues:
+            counts[issue["issue"]] = counts.get(issue["issue"], 0) + 1
+        return {"cities": len(self.nodes), "roads": len(self.edges),
+                "components": len(set(self.component)), "issues": counts}
+
+    def to_dict(self):
+        return {
+            "nodes": self.nodes,
+            "component": self.component,
+            "edges": [[self._id[a], self._id[b], dist, dur, prof] for a, b, dist, dur, prof in self.edges],
+            "issues": self.issues,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        nodes = data["nodes"]
+        edges = [(nodes[a], nodes[b], dist, dur, prof) for a, b, dist, dur, prof in data["edges"]]
+        return cls(nodes, data["component"], edges, data["issues"])
+
+def network_fingerprint(roads, city_coords):
+    """Hash of the raw roads and the city names (detects a stale compiled network)."""
+    payload = json.dumps([sorted(city_coords), roads], sort_keys=True).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+def _components(n, edges):
+    # union-find over node ids; returns dense component ids in node order
+    parent = list(range(n))
+
+    def find(u):
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    for u, v in edges:
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            parent[ru] = rv
+    ids, out = {}, []
+    for u in range(n):
+        out.append(ids.setdefault(find(u), len(ids)))
+    return out
+
+def compile_network(roads, city_coords):
+    """Validate raw road records (roads.json) against the known cities.
+
+    Roads with an unknown city, a missing or non-positive length, the same city
+    at both ends, or an average speed outside MIN_SPEED_KMPH..MAX_SPEED_KMPH
+    are dropped. Duplicates of a city pair are merged, keeping the smallest
+    distance and duration. Every decision is recorded in `issues`.
+    """
+    nodes = list(city_coords)
+    issues = []
+
+    def flag(kind, a, b, detail=""):
+        issues.append({"issue": kind, "from": a, "to": b, "detail": detail})
+
+    merged = {}
+    for road in roads:
+        a, b = road.get("from"), road.get("to")
+        if a not in city_coords or b not in city_coords:
+            flag("unknown_city", a, b, ", ".join(str(c) for c in (a, b) if c not in city_coords))
+            continue
+        if a == b:
+            flag("self_loop", a, b)
+            continue
+        dist, dur = _number(road.get("distance_km")), _number(road.get("duration_hours"))
+        if dist is None or dur is None:
+            flag("missing_length", a, b, "distance_km" if dist is None else "duration_hours")
+            continue
+        if dist <= 0 or dur <= 0:
+            flag("zero_length", a, b, f"{dist} km, {dur} h")
+            continue
+        speed = dist / dur
+        if not MIN_SPEED_KMPH <= speed <= MAX_SPEED_KMPH:
+            flag("implausible_speed", a, b, f"{speed:.1f} km/h")
+            continue
+        key = (a, b) if a <= b else (b, a)
+        prof = road.get("speed_profile")
+        if key in merged:
+            flag("duplicate", a, b)
+            old = merged[key]
+            merged[key] = (min(old[0], dist), min(old[1], dur), old[2] if old[2] is not None else prof)
+        else:
+            merged[key] = (dist, dur, prof)
+
+    edges = [(a, b, dist, dur, prof) for (a, b), (dist, dur, prof) in merged.items()]
+    index = {n: i for i, n in enumerate(nodes)}
+    component = _components(len(nodes), [(index[a], index[b]) for a, b, *_ in edges])
+    return RoadNetwork(nodes, component, edges, issues)
+
+def save_network(network, path, fingerprint):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": NETWORK_FORMAT_VERSION, "fingerprint": fingerprint, **network.to_dict()}, f)
+
+def load_network(path, fingerprint=None):
+    """Network saved by save_network, or None if missing, unreadable or compiled from other data."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != NETWORK_FORMAT_VERSION:
+        return None
+    if fingerprint is not None and data.get("fingerprint") != fingerprint:
+        return None
+    return RoadNetwork.from_dict(data)
+
+def main(argv):
+    # python road_network.py [roads.json] [coords.json] [roads.network.json]
+    road_file, coords_file, out = (argv + ["roads.json", "coords.json", "roads.network.json"][len(argv):])[:3]
+    with open(road_file, encoding="utf-8") as f:
+        roads = json.load(f)
+    with open(coords_file, encoding="utf-8") as f:
+        city_coords = json.load(f)
+    network = compile_network(roads, city_coords)
+    save_network(network, out, network_fingerprint(roads, city_coords))
+    print(json.dumps(network.summary(), indent=2))
+    for issue in network.issues:
+        print(f"{issue['issue']}: {issue['from']} - {issue['to']} {issue['detail']}".rstrip())
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
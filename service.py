@@ -0,0 +1,270 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from graph_builder import build_graph
+from vrp_solver import solve_vrp, ROAD_INDEX_FILE, ROAD_NETWORK_FILE
+from horizon import plan_rolling_horizon
+from timeline import build_timeline
+from kpi import evaluate_routes
+from sweep import run_sweep, expand_grid
+from insertion import insertion_options, DEFAULT_TOP_K
+from jobs import JobRunner, QueueFull
+
+__all__ = ["PlanningService", "make_server", "serve"]
+
+# constants
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PENDING = 32           # queued + running jobs before requests get 503
+SYNC_WAIT_SECONDS = 60             # /plan waits this long before answering 202 with the job id
+RETRY_AFTER_SECONDS = 5
+MAX_BODY_BYTES = 10 * 1024 * 1024
+SERVICE_SESSION = "http"
+
+class BadRequest(Exception):
+    """Malformed plan request (answered with 400)."""
+
+def _number(value, what):
+    # JSON number (or numeric string) -> float, BadRequest otherwise
+    if isinstance(value, bool):
+        raise BadRequest(f"{what} must be a number")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{what} must be a number")
+
+def _whole(value, what):
+    # whole number (kg, truck count) -> int; the solver's capacity dimension only takes integers
+    q = _number(value, what)
+    if not q.is_integer():
+        raise BadRequest(f"{what} must be a whole number, got {value!r}")
+    return int(q)
+
+def _city(value, what, coords):
+    if not isinstance(value, str) or value not in coords:
+        raise BadRequest(f"{what} {value!r} is not a known city")
+    return value
+
+def _plan_args(body, coords):
+    # request body -> solve_vrp keyword arguments (numbers converted, cities checked against coords)
+    if not isinstance(body, dict):
+        raise BadRequest("plan request must be a JSON object")
+    start_city = body.get("start_city")
+    orders = body.get("orders")
+    if not start_city or not isinstance(start_city, str) or not isinstance(orders, list) or not orders:
+        raise BadRequest("start_city and a non-empty orders list are required")
+    _city(start_city, "start_city", coords)
+    chunks = []
+    for oid, r in enumerate(orders, start=1):
+        if not isinstance(r, dict) or not all(k in r for k in ("pickup", "delivery", "demand")):
+            raise BadRequest(f"order {oid} needs pickup, delivery and demand")
+        rr = dict(r)
+        rr.setdefault("id", oid)
+        rr.setdefault("time_limit_hrs", 24)
+        for key in ("pickup", "delivery"):
+            _city(rr[key], f"order {oid} {key}", coords)
+        rr["demand"] = _whole(rr["demand"], f"order {oid} demand (kg)")
+        if rr["demand"] <= 0:
+            raise BadRequest(f"order {oid} demand must be positive")
+        rr["time_limit_hrs"] = _number(rr["time_limit_hrs"], f"order {oid} time_limit_hrs")
+        chunks.append(rr)
+    fleet = body.get("fleet", [])
+    if not isinstance(fleet, list):
+        raise BadRequest("fleet must be a list of vehicle objects")
+    fleet = list(fleet)
+    for k, vp in enumerate(fleet, start=1):
+        if not isinstance(vp, dict) or "capacitate" not in vp:
+            raise BadRequest(f"vehicle {k} must be an object with capacitate")
+        vp = fleet[k - 1] = dict(vp)
+        vp["capacitate"] = _whole(vp["capacitate"], f"vehicle {k} capacitate (kg)")
+        vp["numar"] = _whole(vp.get("numar", 1), f"vehicle {k} numar")
+        for key in ("start_city", "end_city"):
+            if vp.get(key) is not None:
+                _city(vp[key], f"vehicle {k} {key}", coords)
+    departure_hour = body.get("departure_hour")
+    if departure_hour is not None:
+        departure_hour = _number(departure_hour, "departure_hour")
+    workers = body.get("portfolio_workers")
+    if workers is not None:
+        workers = int(_number(workers, "portfolio_workers"))
+    # urgent first, as the app does
+    chunks.sort(key=lambda x: x["time_limit_hrs"])
+    return {
+        "start_city": start_city,
+        "pd_requests": chunks,
+        "vehicle_profiles": sorted(fleet, key=lambda v: v["capacitate"]),
+        "routing_mode": body.get("mode", "Economic"),
+        "open_routes": bool(body.get("open_routes", False)),
+        "departure_hour": departure_hour,
+        "portfolio_workers": workers,
+        "rolling_horizon": bool(body.get("rolling_horizon", False)),
+    }
+
+class PlanningService:
+    """Road network, pair cache and solver pool shared by every HTTP request."""
+
+    def __init__(self, coords, road_file="roads.json", max_workers=DEFAULT_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING, index_path=ROAD_INDEX_FILE, network_path=ROAD_NETWORK_FILE):
+        self.coords = coords
+        self.graph = build_graph(coords, road_file, index_path=index_path, network_path=network_path)
+        self.pair_cache = {}
+        self.td_cache = {}
+        self.runner = JobRunner(max_workers=max_workers, max_pending=max_pending)
+        self._lock = threading.Lock()   # serialises batch admission
+
+    def _solve(self, progress=None, cancel_event=None, rolling_horizon=False, **kwargs):
+        metrics = {}
+        planner = plan_rolling_horizon if rolling_horizon else solve_vrp
+        routes, polylines, total_cost = planner(coords=self.coords, graph=self.graph, pair_cache=self.pair_cache,
+                                                td_cache=self.td_cache,
+                                                metrics=metrics, progress=progress,
+                                                cancel_event=cancel_event, **kwargs)
+        rows, late = build_timeline(routes)
+        return {"routes": routes, "polylines": polylines, "cost": total_cost, "kpi": evaluate_routes(routes),
+                "timeline": rows, "late": late, "metrics": metrics}
+
+    def submit(self, body):
+        return self.runner.submit(SERVICE_SESSION, self._solve, **_plan_args(body, self.coords))
+
+    def submit_batch(self, bodies):
+        """Admit every plan of a batch or none of them (QueueFull)."""
+        if not isinstance(bodies, list) or not bodies:
+            raise BadRequest("batch must be a non-empty list of plan requests")
+        args = [_plan_args(b, self.coords) for b in bodies]
+        with self._lock:
+            limit = self.runner.max_pending
+            if limit is not None and self.runner.pending() + len(args) > limit:
+                raise QueueFull(f"batch of {len(args)} does not fit in the queue")
+            return [self.runner.submit(SERVICE_SESSION, self._solve, **a) for a in args]
+
+    def _sweep(self, progress=None, cancel_event=None, **kwargs):
+        rows = run_sweep(coords=self.coords, graph=self.graph, pair_cache=self.pair_cache, progress=progress,
+                         cancel_event=cancel_event, **kwargs)
+        return {"variants": rows}
+
+    def submit_sweep(self, body):
+        """Queue a what-if sweep: {"scenario": draw_table export, "grid": {...}, "start_city"?}."""
+        if not isinstance(body, dict) or not isinstance(body.get("scenario"), dict):
+            raise BadRequest("sweep request needs a scenario object")
+        grid = body.get("grid") or {}
+        try:
+            expand_grid(grid)
+        except (ValueError, TypeError, AttributeError) as e:
+            raise BadRequest(f"invalid grid: {e}")
+        return self.runner.submit(SERVICE_SESSION, self._sweep, scenario=body["scenario"], grid=grid,
+                                  start_city=body.get("start_city"), max_workers=body.get("workers"))
+
+    def insert(self, body):
+        """Top-k insertions of one urgent order into a solved plan; answered inline, not queued."""
+        if not isinstance(body, dict) or not isinstance(body.get("routes"), list) or not isinstance(body.get("order"), dict):
+            raise BadRequest("insert request needs routes and an order object")
+        metrics = {}
+        try:
+            options = insertion_options(body["routes"], body["order"], self.coords, graph=self.graph,
+                                        pair_cache=self.pair_cache, routing_mode=body.get("mode", "Economic"),
+                                        top_k=int(body.get("top_k", DEFAULT_TOP_K)), now_h=body.get("now_h"),
+                                        metrics=metrics)
+        except (ValueError, TypeError, KeyError) as e:
+            raise BadRequest(f"invalid insert request: {e}")
+        return {"options": options, "resolve_needed": not options, "metrics": metrics}
+
+    def shutdown(self):
+        self.runner.shutdown(wait=False)
+
+def _handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code, payload, headers=None):
+            data = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                raise BadRequest("invalid Content-Length")
+            if length < 0 or length > MAX_BODY_BYTES:
+                raise BadRequest("request body too large")
+            try:
+                return json.loads(self.rfile.read(length) or b"null")
+            except ValueError as e:
+                raise BadRequest(f"invalid JSON: {e}")
+
+        def _busy(self, e):
+            self._send(503, {"error": str(e)}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if parts == ["health"]:
+                runner = service.runner
+                self._send(200, {"status": "ok", "workers": runner.max_workers,
+                                 "pending": runner.pending(), "max_pending": runner.max_pending,
+                                 "cached_pairs": len(service.pair_cache)})
+            elif len(parts) == 2 and parts[0] == "jobs":
+                job = service.runner.status(parts[1])
+                if job is None:
+                    self._send(404, {"error": "unknown job"})
+                else:
+                    self._send(200, job)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                body = self._body()
+                if self.path == "/plan":
+                    job_id = service.submit(body)
+                    job = service.runner.wait(job_id, SYNC_WAIT_SECONDS)
+                    self._send(202 if job["state"] in ("queued", "running") else 200, job)
+                elif self.path == "/plan/batch":
+                    self._send(202, {"jobs": service.submit_batch(body)})
+                elif self.path == "/sweep":
+                    self._send(202, {"id": service.submit_sweep(body)})
+                elif self.path == "/insert":
+                    self._send(200, service.insert(body))
+                else:
+                    self._send(404, {"error": "not found"})
+            except BadRequest as e:
+                self._send(400, {"error": str(e)})
+            except QueueFull as e:
+                self._busy(e)
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def do_DELETE(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) == 2 and parts[0] == "jobs":
+                self._send(200 if service.runner.cancel(parts[1]) else 404, {"id": parts[1]})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """HTTP server for `service`; POST /plan, POST /plan/batch, POST /insert, GET|DELETE /jobs/<id>, GET /health."""
+    return ThreadingHTTPServer((host, port), _handler(service))
+
+def serve(coords_path="coords.json", road_file="roads.json", host=DEFAULT_HOST, port=DEFAULT_PORT):
+    with open(coords_path, encoding="utf-8") as f:
+        coords = json.load(f)
+    service = PlanningService(coords, road_file)
+    server = make_server(service, host, port)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.shutdown()
+
+if __name__ == "__main__":
+    serve()
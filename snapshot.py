@@ -0,0 +1,254 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+__all__ = ["Snapshot", "dumps_snapshot", "dump_snapshot", "loads_snapshot", "load_snapshot", "read_scenario",
+           "SNAPSHOT_SUFFIX"]
+
+# constants
+SNAPSHOT_MAGIC = b"VRPSNAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".vrps"
+_PREAMBLE = struct.Struct("<8sHI")   # magic, format version, header length
+_ALIGN = 8                           # column blocks start on 8-byte boundaries
+_ABSENT, _PRESENT, _NULL = 0, 1, 2   # per-row mask values of a column
+_INT64 = 2**63
+
+def _kind(values):
+    # storage of a column from its present, non-null values: array typecode, "s" (string ids) or "json"
+    if all(isinstance(v, int) and not isinstance(v, bool) and -_INT64 <= v < _INT64 for v in values):
+        return "q"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return "d"
+    if all(isinstance(v, str) for v in values):
+        return "s"
+    return "json"
+
+class _Writer:
+    """Column blocks and the interned string table of a snapshot being written."""
+
+    def __init__(self):
+        self.blocks, self.size = [], 0
+        self.strings, self._sid = [], {}
+
+    def block(self, arr):
+        data = arr.tobytes()
+        ref = [self.size, arr.typecode, len(arr)]
+        data += b"\0" * (-len(data) % _ALIGN)
+        self.blocks.append(data)
+        self.size += len(data)
+        return ref
+
+    def sid(self, s):
+        if s not in self._sid:
+            self._sid[s] = len(self.strings)
+            self.strings.append(s)
+        return self._sid[s]
+
+    def table(self, records):
+        """Records (dicts) stored column-wise: one block per key, plus a mask where a key is missing / None."""
+        cols = []
+        for key in dict.fromkeys(k for r in records for k in r):
+            mask = array('B', (_ABSENT if key not in r else _NULL if r[key] is None else _PRESENT for r in records))
+            present = [r[key] for r in records if r.get(key) is not None]
+            col = {"key": key, "kind": _kind(present)}
+            if any(m != _PRESENT for m in mask):
+                col["mask"] = self.block(mask)
+            if col["kind"] == "json":
+                col["values"] = present
+            elif col["kind"] == "s":
+                col["data"] = self.block(array('I', (self.sid(r[key]) if r.get(key) is not None else 0
+                                                     for r in records)))
+            else:
+                col["data"] = self.block(array(col["kind"], (r[key] if r.get(key) is not None else 0
+                                                             for r in records)))
+                if col["kind"] == "d" and any(isinstance(v, int) for v in present):
+                    # mixed int / float column: remember which rows held ints
+                    col["ints"] = self.block(array('B', (isinstance(r.get(key), int) for r in records)))
+            cols.append(col)
+        return {"rows": len(records), "columns": cols}
+
+def dumps_snapshot(scenario):
+    """Binary snapshot of a scenario dict ({"fleet", "orders", "routes", "meta", ...}).
+
+    Orders, routes and route steps are stored column-wise (vehicle dicts are
+    stored once and referenced by index); every other key (fleet, solver
+    metadata) goes into the JSON header as is.
+    """
+    w = _Writer()
+    header = {"byteorder": sys.byteorder, "keys": list(scenario), "doc": {}, "tables": {}}
+    for key, value in scenario.items():
+        if key not in ("orders", "routes"):
+            header["doc"][key] = value
+    if "orders" in scenario:
+        header["tables"]["orders"] = w.table(list(scenario["orders"]))
+    if "routes" in scenario:
+        vehicles, vid, routes, steps = [], {}, [], []
+        offsets = array('q', [0])
+        for r in scenario["routes"]:
+            row = {k: v for k, v in r.items() if k not in ("vehicul", "traseu")}
+            if "vehicul" in r:
+                key = json.dumps(r["vehicul"], sort_keys=True, default=str)
+                if key not in vid:
+                    vid[key] = len(vehicles)
+                    vehicles.append(r["vehicul"])
+                row["vehicul"] = vid[key]
+            routes.append(row)
+            steps.extend(r.get("traseu", []))
+            offsets.append(len(steps))
+        header["vehicles"] = vehicles
+        header["step_offsets"] = w.block(offsets)
+        header["tables"]["routes"] = w.table(routes)
+        header["tables"]["steps"] = w.table(steps)
+    header["strings"] = w.strings
+
+    head = json.dumps(header, separators=(",", ":"), default=str).encode("utf-8")
+    out = [_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(head)), head]
+    out.append(b"\0" * (-(_PREAMBLE.size + len(head)) % _ALIGN))
+    return b"".join(out + w.blocks)
+
+def dump_snapshot(scenario, path):
+    with open(path, "wb") as f:
+        f.write(dumps_snapshot(scenario))
+
+class Snapshot:
+    """Read-only view of a snapshot buffer (bytes or a memory-mapped file).
+
+    Only the JSON header is parsed on open; `column()` returns zero-copy views
+    of the stored blocks, and `records()` / `to_dict()` build plain dicts
+    when they are asked for.
+    """
+
+    def __init__(self, buf, _mmap=None):
+        magic, version, hlen = _PREAMBLE.unpack_from(buf, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("not a scenario snapshot")
+        if version > SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot format {version} is newer than this reader ({SNAPSHOT_VERSION})")
+        self.version = version
+        self._buf = memoryview(buf)
+        self._mmap = _mmap
+        start = _PREAMBLE.size
+        self.header = json.loads(bytes(self._buf[start:start + hlen]))
+        self._data = start + hlen + (-(start + hlen) % _ALIGN)
+        self._swap = self.header["byteorder"] != sys.byteorder
+        self.strings = self.header["strings"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass   # column views still alive; the map goes away with them
+
+    @property
+    def meta(self):
+        return self.header["doc"].get("meta", {})
+
+    def _block(self, ref):
+        off, typecode, n = ref
+        start = self._data + off
+        raw = self._buf[start:start + n * array(typecode).itemsize]
+        if self._swap:
+            arr = array(typecode)
+            arr.frombytes(raw)
+            arr.byteswap()
+            return arr
+        return raw.cast(typecode)
+
+    def rows(self, table):
+        return self.header["tables"][table]["rows"] if table in self.header["tables"] else 0
+
+    def column(self, table, key):
+        """Stored values of one key (string columns as ids into `strings`); None for json columns."""
+        for col in self.header["tables"][table]["columns"]:
+            if col["key"] == key:
+                return self._block(col["data"]) if "data" in col else None
+        raise KeyError(key)
+
+    def records(self, table):
+        """The rows of a table as dicts, exactly as they were written."""
+        if table not in self.header["tables"]:
+            return []
+        t = self.header["tables"][table]
+        rows = [{} for _ in range(t["rows"])]
+        for col in t["columns"]:
+            key, kind = col["key"], col["kind"]
+            if kind == "json":
+                values = iter(col["values"])
+            elif kind == "s":
+                values = [self.strings[s] for s in self._block(col["data"])]
+            else:
+                values = self._block(col["data"]).tolist()
+                if "ints" in col:
+                    values = [int(v) if i else v for v, i in zip(values, self._block(col["ints"]))]
+            if "mask" not in col:
+                for row, v in zip(rows, values):
+                    row[key] = v
+                continue
+            if kind == "json":
+                values = [next(values) if m == _PRESENT else None for m in self._block(col["mask"])]
+            for row, m, v in zip(rows, self._block(col["mask"]), values):
+                if m == _PRESENT:
+                    row[key] = v
+                elif m == _NULL:
+                    row[key] = None
+        return rows
+
+    def routes(self):
+        routes = self.records("routes")
+        if not routes:
+            return routes
+        steps = self.records("steps")
+        offsets = self._block(self.header["step_offsets"])
+        vehicles = self.header["vehicles"]
+        for r, route in enumerate(routes):
+            if "vehicul" in route:
+                route["vehicul"] = dict(vehicles[route["vehicul"]])
+            route["traseu"] = steps[offsets[r]:offsets[r + 1]]
+        return routes
+
+    def to_dict(self):
+        """The scenario dict the snapshot was written from."""
+        doc = self.header["doc"]
+        out = {}
+        for key in self.header["keys"]:
+            if key == "orders":
+                out[key] = self.records("orders")
+            elif key == "routes":
+                out[key] = self.routes()
+            else:
+                out[key] = doc[key]
+        return out
+
+def loads_snapshot(data):
+    return Snapshot(data)
+
+def load_snapshot(path):
+    """Memory-map a snapshot file; close the Snapshot (or use it as a context manager) when done."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Snapshot(mm, _mmap=mm)
+
+def read_scenario(source):
+    """Scenario / fleet / orders from a snapshot or a JSON file (path, bytes or file object)."""
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            is_snapshot = f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+        if is_snapshot:
+            with load_snapshot(source) as snap:
+                return snap.to_dict()
+        with open(source, encoding="utf-8") as f:
+            return json.load(f)
+    data = source if isinstance(source, (bytes, bytearray)) else source.read()
+    if bytes(data[:len(SNAPSHOT_MAGIC)]) == SNAPSHOT_MAGIC:
+        return Snapshot(data).to_dict()
+    return json.loads(data)
@@ -0,0 +1,60 @@
+import heapq
+from math import cos, radians
+
+__all__ = ["KDTree"]
+
+# constants
+KM_PER_DEG_LAT = 111.32            # equirectangular projection (fine at country scale)
+
+class KDTree:
+    """2-d tree over named (lat, lon) points, queried with k-nearest in km."""
+
+    def __init__(self, points):
+        # points: {name: (lat, lon)}
+        self.names = list(points)
+        lat0 = sum(p[0] for p in points.values()) / max(len(points), 1)
+        self._kx = KM_PER_DEG_LAT * cos(radians(lat0))
+        self._xy = [self._project(points[n]) for n in self.names]
+        self._root = self._build(list(range(len(self.names))), 0)
+
+    @classmethod
+    def from_coords(cls, coords, cities=None):
+        """Index the `coords.json` mapping (optionally restricted to `cities`)."""
+        names = coords if cities is None else cities
+        return cls({c: tuple(coords[c]['coords']) for c in names})
+
+    def _project(self, p):
+        return (p[1] * self._kx, p[0] * KM_PER_DEG_LAT)
+
+    def _build(self, idx, depth):
+        # node: (point index, axis, left, right)
+        if not idx:
+            return None
+        axis = depth % 2
+        idx.sort(key=lambda i: self._xy[i][axis])
+        mid = len(idx) // 2
+        return (idx[mid], axis, self._build(idx[:mid], depth + 1), self._build(idx[mid + 1:], depth + 1))
+
+    def nearest(self, point, k=1):
+        """Names of the k points closest to a (lat, lon) pair, nearest first."""
+        if self._root is None or k <= 0:
+            return []
+        qx, qy = self._project(point)
+        heap = []  # max-heap of (-d2, i), size <= k
+        stack = [(self._root, 0.0)]  # (subtree, squared distance to its splitting plane)
+        while stack:
+            node, bound = stack.pop()
+            if node is None or (len(heap) == k and bound >= -heap[0][0]):
+                continue
+            i, axis, left, right = node
+            x, y = self._xy[i]
+            d2 = (x - qx) ** 2 + (y - qy) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, i))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, i))
+            diff = (qx - x) if axis == 0 else (qy - y)
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append((far, diff * diff))
+            stack.append((near, 0.0))
+        return [self.names[i] for _, i in sorted(heap, key=lambda h: -h[0])]
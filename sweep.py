@@ -0,0 +1,106 @@
+import copy
+import itertools
+from graph_builder import build_graph
+from vrp_solver import solve_vrp, warm_pair_cache, SolveCancelled, ROAD_INDEX_FILE, ROAD_NETWORK_FILE
+from orders import CityTable, OrderBook
+from kpi import evaluate_routes, KPI_FIELDS
+from portfolio import map_parallel, task_stop
+
+__all__ = ["run_sweep", "expand_grid"]
+
+# constants
+DEFAULT_MODES = ("Economic",)
+GRID_KEYS = ("fleet_counts", "capacities", "crew", "mode")
+
+def expand_grid(grid):
+    """Variants of a parameter grid, as flat dicts.
+
+    grid: {"fleet_counts": {vehicle name: [counts]}, "capacities": {name: [kg]},
+    "crew": {name: [bools]}, "mode": ["Economic", "Fast"]}; every key optional.
+    A variant looks like {"mode": "Fast", "numar[Truck]": 3, "capacitate[Truck]": 20000}.
+    """
+    unknown = set(grid) - set(GRID_KEYS)
+    if unknown:
+        raise ValueError(f"unknown sweep parameters: {sorted(unknown)}")
+    axes = [("mode", list(grid.get("mode") or DEFAULT_MODES))]
+    for key, field in (("fleet_counts", "numar"), ("capacities", "capacitate"), ("crew", "echipaj")):
+        for name, values in (grid.get(key) or {}).items():
+            axes.append((f"{field}[{name}]", list(values)))
+    names = [a for a, _ in axes]
+    return [dict(zip(names, combo)) for combo in itertools.product(*(v for _, v in axes))]
+
+def _variant_fleet(fleet, variant):
+    fleet = copy.deepcopy(fleet)
+    for key, value in variant.items():
+        if "[" not in key:
+            continue
+        field, name = key[:-1].split("[", 1)
+        matched = [vp for vp in fleet if vp.get("nume") == name]
+        if not matched:
+            raise ValueError(f"no vehicle named {name!r} in the fleet")
+        for vp in matched:
+            vp[field] = value
+    return [vp for vp in fleet if int(vp.get("numar", 1) or 0) > 0]
+
+def _run_variant(data, variant):
+    # one sweep variant (worker process): KPI row, or the error that stopped it
+    row = dict(variant)
+    try:
+        fleet = _variant_fleet(data["fleet"], variant)
+        max_cap = max((vp["capacitate"] for vp in fleet), default=0)
+        if not fleet or max_cap <= 0:
+            row["error"] = "no vehicles in variant" if not fleet else "no vehicle capacity in variant"
+            return row
+        book = data["orders"]
+        if book.over_capacity(max_cap):
+            book = book.split(max_cap)
+        routes, _, cost = solve_vrp(data["start_city"], book.sorted_by_deadline(), data["coords"],
+                                    sorted(fleet, key=lambda v: v["capacitate"]), variant["mode"],
+                                    graph=data["graph"], pair_cache=data["pair_cache"], cancel_event=task_stop,
+                                    **data["solve_kwargs"])
+    except SolveCancelled:
+        return None   # the sweep was cancelled; no row for this variant
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+    fleet_kpi = evaluate_routes(routes)["fleet"]
+    row["cost"] = cost
+    row["vehicles_available"] = sum(int(vp.get("numar", 1)) for vp in fleet)
+    row["vehicles_used"] = int(fleet_kpi["vehicles_used"])
+    row.update({k: fleet_kpi[k] for k in KPI_FIELDS})
+    return row
+
+def run_sweep(scenario, grid, coords, start_city=None, graph=None, pair_cache=None, max_workers=None,
+              progress=None, cancel_event=None, **solve_kwargs):
+    """Solve every variant of `grid` on a base scenario; returns one KPI row per variant.
+
+    `scenario` has the shape of the draw_table export ({"fleet", "orders", ...});
+    the depot defaults to the first route's departure city. Variants run in
+    parallel processes that share the road graph and a pair cache filled once
+    up front; each solve still gets its own construction warm start. Once
+    `cancel_event` is set no further variant starts and only the rows
+    already finished are returned.
+    """
+    if start_city is None:
+        routes = scenario.get("routes") or []
+        start_city = routes[0]["traseu"][0]["oras"] if routes and routes[0].get("traseu") else None
+    if not start_city:
+        raise ValueError("start_city is required (the scenario has no routes to take it from)")
+    cities = CityTable.from_coords(coords)
+    book = OrderBook.from_requests(scenario.get("orders", []), cities)
+    if graph is None:
+        graph = build_graph(coords, index_path=ROAD_INDEX_FILE, network_path=ROAD_NETWORK_FILE)
+    pair_cache = {} if pair_cache is None else pair_cache
+    fleet = scenario.get("fleet", [])
+    used = [start_city] + [vp[k] for vp in fleet for k in ("start_city", "end_city") if vp.get(k)]
+    warm_pair_cache(graph, coords, list(dict.fromkeys(used + [o[k] for o in book for k in ("pickup", "delivery")])),
+                    pair_cache)
+
+    variants = expand_grid(grid)
+    data = {"start_city": start_city, "fleet": fleet, "orders": book, "coords": coords,
+            "graph": graph, "pair_cache": pair_cache, "solve_kwargs": solve_kwargs}
+    on_result = (lambda done, total: progress({"variants_done": done, "variants": total})) if progress else None
+    should_stop = cancel_event.is_set if cancel_event is not None else None
+    rows = map_parallel(_run_variant, data, variants, max_workers=max_workers, on_result=on_result,
+                        should_stop=should_stop)
+    return [row for row in rows if row is not None]
@@ -0,0 +1,23 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(autouse=True)
+def _repo_cwd(monkeypatch):
+    # the modules open roads.json / coords.json relative to the working directory
+    monkeypatch.chdir(ROOT)
+
+@pytest.fixture(scope="session")
+def coords():
+    with open(os.path.join(ROOT, "coords.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+@pytest.fixture(scope="session")
+def graph(coords):
+    from graph_builder import build_graph
+    return build_graph(coords, os.path.join(ROOT, "roads.json"))
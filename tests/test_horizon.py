@@ -0,0 +1,44 @@
+import threading
+
+import horizon
+from horizon import plan_rolling_horizon
+from vrp_solver import solve_vrp, SolveCancelled
+
+ORDERS = [
+    {"id": 1, "pickup": "Bacau", "delivery": "Barlad", "demand": 1000, "time_limit_hrs": 20},
+    {"id": 2, "pickup": "Arad", "delivery": "Ilia", "demand": 1000, "time_limit_hrs": 60},
+]
+FLEET = [{"nume": "Truck", "capacitate": 25000, "echipaj": False, "numar": 1}]
+
+def test_slices_report_into_the_horizon_metrics(coords, graph):
+    metrics = {}
+    routes, _, _ = plan_rolling_horizon("Adjud", ORDERS, coords, FLEET, "Economic", graph=graph,
+                                        metrics=metrics, profile=True)
+    served = sorted(s["order_id"] for r in routes for s in r["traseu"] if s["tip"] == "delivery")
+    assert served == [1, 2]
+    values = metrics["values"]
+    assert values["horizon_slices"] == 2
+    assert values["slice_1"]["orders"] == 1 and values["slice_2"]["orders"] == 1
+    assert "search" in metrics["stages"] and "horizon_slice" in metrics["stages"]
+    assert "profile" in metrics
+
+def test_cancel_keeps_the_committed_days(coords, graph):
+    cancel = threading.Event()
+    def progress(update):
+        cancel.set()    # cancel during the first slice's search
+    routes, _, _ = plan_rolling_horizon("Adjud", ORDERS, coords, FLEET, "Economic", graph=graph,
+                                        progress=progress, cancel_event=cancel)
+    served = sorted(s["order_id"] for r in routes for s in r["traseu"] if s["tip"] == "delivery")
+    assert served == [1]
+
+def test_slice_cancelled_before_its_search(coords, graph, monkeypatch):
+    calls = []
+    def solve(*args, **kwargs):
+        calls.append(1)
+        if len(calls) > 1:
+            raise SolveCancelled("solve cancelled")
+        return solve_vrp(*args, **kwargs)
+    monkeypatch.setattr(horizon, "solve_vrp", solve)
+    routes, _, _ = horizon.plan_rolling_horizon("Adjud", ORDERS, coords, FLEET, "Economic", graph=graph)
+    served = sorted(s["order_id"] for r in routes for s in r["traseu"] if s["tip"] == "delivery")
+    assert served == [1]
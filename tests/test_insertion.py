@@ -0,0 +1,42 @@
+import pytest
+
+from insertion import insertion_options, apply_insertion
+from load_profile import route_profile
+from vrp_solver import solve_vrp
+
+FLEET = [{"nume": "Truck", "capacitate": 25000, "echipaj": False, "numar": 2}]
+ORDERS = [
+    {"id": 1, "pickup": "Arad", "delivery": "Bacau", "demand": 5000, "time_limit_hrs": 48},
+    {"id": 2, "pickup": "Alba Iulia", "delivery": "Barlad", "demand": 5000, "time_limit_hrs": 48},
+]
+URGENT = {"pickup": "Alexandria", "delivery": "Baia Mare", "demand": 3000, "time_limit_hrs": 200}
+
+@pytest.fixture(scope="module")
+def plan(coords, graph):
+    routes, _, _ = solve_vrp("Adjud", ORDERS, coords, FLEET, "Economic", graph=graph)
+    return routes
+
+def test_options_are_cheapest_first_and_carry_the_order(plan, coords, graph):
+    options = insertion_options(plan, URGENT, coords, graph=graph, top_k=3)
+    assert options
+    assert [o["delta_cost"] for o in options] == sorted(o["delta_cost"] for o in options)
+    for o in options:
+        steps = o["route"]["traseu"]
+        assert [s["tip"] for s in steps if s.get("order_id") == o["order_id"]] == ["pickup", "delivery"]
+        assert max(s["load"] for s in steps) <= 25000
+
+def test_order_heavier_than_every_truck_needs_a_resolve(plan, coords, graph):
+    assert insertion_options(plan, dict(URGENT, demand=30000), coords, graph=graph) == []
+
+def test_apply_insertion_updates_cached_profile(plan, coords, graph):
+    profiles = {}
+    option = insertion_options(plan, URGENT, coords, graph=graph, profiles=profiles)[0]
+    new_plan = apply_insertion(plan, option, profiles)
+    r = option["route_index"]
+    assert new_plan[r] is option["route"]
+    assert plan[r] is not option["route"]
+    assert profiles[r].loads == route_profile(new_plan[r])[1].loads
+
+def test_unknown_city_is_rejected(plan, coords, graph):
+    with pytest.raises(ValueError):
+        insertion_options(plan, dict(URGENT, pickup="Atlantis"), coords, graph=graph)
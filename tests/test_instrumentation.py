@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from instrumentation import collect, stage, incr, ProfilingBusy
+
+def test_collect_records_stages_and_counters():
+    with collect() as m:
+        with stage("work"):
+            incr("steps", 3)
+    assert "work" in m["stages"] and m["counters"]["steps"] == 3
+
+def test_nested_profiling_is_refused():
+    with collect(profile=True) as outer:
+        with pytest.raises(ProfilingBusy):
+            with collect(trace_memory=True):
+                pass
+        with collect() as inner:    # plain metrics still nest
+            incr("inner")
+    assert "profile" in outer and inner["counters"]["inner"] == 1
+
+def test_concurrent_profiling_is_refused_then_released():
+    inside, release, errors = threading.Event(), threading.Event(), []
+    def hold():
+        with collect(profile=True):
+            inside.set()
+            release.wait(5)
+    t = threading.Thread(target=hold)
+    t.start()
+    inside.wait(5)
+    try:
+        with collect(trace_memory=True):
+            pass
+    except ProfilingBusy as e:
+        errors.append(e)
+    release.set()
+    t.join()
+    assert errors
+    with collect(profile=True, trace_memory=True) as m:
+        pass
+    assert "profile" in m and "memory" in m
@@ -0,0 +1,61 @@
+import math
+
+import pytest
+
+from kpi import KPI_FIELDS, evaluate_routes, plan_cost, score_plans
+from timeline import BREAK_WINDOW, DRIVER_BREAK_, SERVICE_TIME
+
+INF = math.inf
+CITIES = ["Adjud", "Bacau", "Barlad"]
+KM = [[0, 100, 150], [100, 0, 200], [150, 200, 0]]
+HOURS = [[0, 2, 2], [2, 0, 3], [2, 3, 0]]
+
+def _route(crew=False, deadline=4):
+    # Adjud -> pickup Bacau -> delivery Barlad -> Adjud, 5 t on a 10 t truck
+    steps = [{"tip": "plecare", "oras": "Adjud", "distanta": 0, "durata": 0}]
+    for tip, city, kg, tl in (("pickup", "Bacau", 5000, None), ("delivery", "Barlad", 5000, deadline),
+                              ("intoarcere", "Adjud", 0, None)):
+        a, b = CITIES.index(steps[-1]["oras"]), CITIES.index(city)
+        steps.append({"tip": tip, "oras": city, "distanta": KM[a][b], "durata": HOURS[a][b], "demand": kg,
+                      "time_limit": tl})
+    return {"vehicul": {"nume": "Truck", "capacitate": 10000, "echipaj": crew}, "traseu": steps}
+
+def _idle():
+    return {"vehicul": {"nume": "Spare", "capacitate": 10000}, "traseu": [{"tip": "plecare", "oras": "Adjud"}]}
+
+def _plan_row(crew=False, deadline=4):
+    return {"cities": [0, 1, 2, 0], "delta": [0, 5000, -5000, 0], "deadline": [INF, INF, deadline, INF],
+            "service": [False, True, True, False], "capacity": 10000, "crew": crew}
+
+def test_evaluate_routes_by_hand():
+    kpi = evaluate_routes([_route(), _idle()])
+    truck = kpi["vehicles"][0]
+    assert truck["distance_km"] == 450
+    assert truck["drive_h"] == 7
+    assert truck["service_h"] == 2 * SERVICE_TIME
+    # one 45 min break: 5 h driven by the delivery, 7 h by the end (BREAK_WINDOW = 4.5 h)
+    assert BREAK_WINDOW == 4.5
+    assert truck["rest_h"] == DRIVER_BREAK_
+    assert truck["duration_h"] == 7 + 2 * SERVICE_TIME + DRIVER_BREAK_
+    # arrival at the delivery: 5 h driving + service at the pickup + the break, due at 4 h
+    assert truck["lateness_h"] == pytest.approx(5 + SERVICE_TIME + DRIVER_BREAK_ - 4)
+    assert truck["late_stops"] == 1
+    # 5 t carried over the 200 km leg, out of 10 t x 450 km
+    assert truck["utilization"] == pytest.approx(5000 * 200 / (10000 * 450))
+    assert kpi["vehicles"][1]["distance_km"] == 0
+    assert kpi["fleet"]["vehicles_used"] == 1
+    assert kpi["fleet"]["distance_km"] == 450
+
+def test_plan_cost_follows_the_routing_mode():
+    assert plan_cost([_route()], "Economic") == 450
+    assert plan_cost([_route()], "Fast") == 7
+
+def test_score_plans_agrees_with_evaluate_routes():
+    plans = [[_plan_row()], [_plan_row(crew=True, deadline=20), _plan_row()], []]
+    scored = score_plans(KM, HOURS, plans)
+    expected = [evaluate_routes([_route()])["fleet"],
+                evaluate_routes([_route(crew=True, deadline=20), _route()])["fleet"],
+                evaluate_routes([])["fleet"]]
+    for p, fleet in enumerate(expected):
+        for k in KPI_FIELDS + ("vehicles_used",):
+            assert scored[k][p] == pytest.approx(fleet[k]), (p, k)
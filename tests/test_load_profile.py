@@ -0,0 +1,77 @@
+import itertools
+import random
+
+import pytest
+
+from construction import regret_insertion
+from load_profile import LoadProfile, route_profile, stamp_loads
+
+def _loads(deltas):
+    out = [0.0]
+    for q in deltas:
+        out.append(out[-1] + q)
+    return out
+
+def _random_route(rng):
+    stops = []
+    for o in range(rng.randint(1, 5)):
+        q = rng.randint(1, 10)
+        i = rng.randint(0, len(stops))
+        j = rng.randint(i, len(stops))
+        stops[j:j] = [(o, -q)]
+        stops[i:i] = [(o, q)]
+    return stops
+
+def test_checks_match_brute_force():
+    rng = random.Random(7)
+    for _ in range(200):
+        stops = _random_route(rng)
+        deltas = [q for _, q in stops]
+        cap = rng.randint(5, 30)
+        profile = LoadProfile(deltas, cap)
+        for i, j in itertools.combinations_with_replacement(range(len(deltas) + 1), 2):
+            moved = deltas[:]
+            moved[j:j] = [-7]
+            moved[i:i] = [7]
+            after = _loads(moved)
+            assert profile.can_insert(i, j, 7) == (max(after[i + 1:j + 2]) <= cap)
+            assert profile.insert(i, j, 7).loads == after
+        where = {}
+        for k, (o, q) in enumerate(stops, start=1):
+            where.setdefault(o, []).append((k, q))
+        for (a, q), (b, _) in where.values():
+            rest = [d for k, d in enumerate(deltas, start=1) if k not in (a, b)]
+            assert profile.can_remove(a, b, q) == (max(_loads(rest)) <= cap)
+            assert profile.remove(a, b).loads == _loads(rest)
+            swapped = deltas[:]
+            swapped[a - 1], swapped[b - 1] = 4, -4
+            assert profile.can_swap(a, b, q, 4) == (max(_loads(swapped)[a:b]) <= cap)
+
+def test_forced_overload_does_not_block_other_spans():
+    # stop 1..2 carry 20 kg on a 15 kg truck; an order after the delivery still fits
+    profile = LoadProfile([20, -20], 15)
+    assert profile.overloaded
+    assert profile.can_insert(2, 2, 10)
+    assert not profile.can_insert(0, 1, 1)
+
+def test_regret_insertion_respects_capacity():
+    cost = [[0, 1, 1], [1, 0, 1], [1, 1, 0]]
+    stops, forced = regret_insertion(cost, [(1, 2, 10), (1, 2, 10)], [{"start": 0, "end": 0, "capacity": 15}])
+    assert forced == []
+    profile = LoadProfile([10 if kind == "pickup" else -10 for _, kind in stops[0]], 15)
+    assert not profile.overloaded
+
+def test_regret_insertion_forces_oversized_order_only():
+    cost = [[0, 1, 1], [1, 0, 1], [1, 1, 0]]
+    _, forced = regret_insertion(cost, [(1, 2, 20), (1, 2, 10)], [{"start": 0, "end": 0, "capacity": 15}])
+    assert forced == [0]
+
+def test_stamp_loads_per_step():
+    route = {"vehicul": {"capacitate": 100}, "traseu": [
+        {"tip": "plecare"}, {"tip": "intermediar"}, {"tip": "pickup", "demand": 60},
+        {"tip": "intermediar"}, {"tip": "delivery", "demand": 60}, {"tip": "intoarcere"},
+    ]}
+    assert stamp_loads([route]) == 0
+    assert [s["load"] for s in route["traseu"]] == [0, 0, 60, 60, 0, 0]
+    idx, profile = route_profile(route)
+    assert idx == [0, 2, 4] and profile.capacity == 100
@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+from orders import CityTable, OrderBook, read_orders, DEFAULT_TIME_LIMIT_H
+
+@pytest.fixture
+def cities():
+    return CityTable(["Arad", "Bacau", "Barlad"])
+
+def _book(cities, *demands):
+    book = OrderBook(cities)
+    for q in demands:
+        book.append("Arad", "Bacau", q)
+    return book
+
+def test_split_cuts_heavy_orders_into_parts(cities):
+    parts = _book(cities, 25000, 5000).split(10000)
+    assert list(parts.demand) == [10000, 10000, 5000, 5000]
+    assert list(parts.order_id) == [1, 1, 1, 2]
+    assert list(parts.part) == [1, 2, 3, 1]
+
+def test_split_exact_multiple_has_no_empty_part(cities):
+    assert list(_book(cities, 20000).split(10000).demand) == [10000, 10000]
+
+def test_split_empty_book(cities):
+    assert len(OrderBook(cities).split(10000)) == 0
+
+@pytest.mark.parametrize("max_cap", [0, -5])
+def test_split_rejects_non_positive_capacity(cities, max_cap):
+    with pytest.raises(ValueError):
+        _book(cities, 100).split(max_cap)
+
+CSV = (
+    "pickup,delivery,demand,time_limit_hrs\n"
+    "Arad,Bacau,1000,12\n"
+    "Bacau,Barlad,2000,\n"
+    "Arad,Barlad,1000.5,10\n"
+    "Arad,Barlad,500,0\n"
+    "Arad,Nowhere,500,5\n"
+    "Arad,Barlad,-3,5\n"
+    "Arad,Barlad,3000.0,-1\n"
+    "Barlad,Arad,3000.0,6\n"
+)
+
+def test_read_orders_csv(cities):
+    book, rejected, errors = read_orders(io.StringIO(CSV), cities, fmt="csv")
+    assert [o["demand"] for o in book] == [1000, 2000, 3000]
+    assert all(isinstance(o["demand"], int) for o in book)
+    assert [o["time_limit_hrs"] for o in book] == [12, DEFAULT_TIME_LIMIT_H, 6]
+    assert [o["id"] for o in book] == [1, 2, 3]
+    assert rejected == 5
+    assert errors[0].startswith("line 4: demand must be a whole number")
+    assert errors[1].startswith("line 5: time_limit_hrs must be positive")
+
+def test_read_orders_jsonl_from_binary_file(cities):
+    data = b'{"pickup": "Arad", "delivery": "Bacau", "demand": 700}\n\nnot json\n'
+    stream = io.BytesIO(data)
+    stream.name = "orders.jsonl"
+    book, rejected, errors = read_orders(stream, cities)
+    assert [(o["pickup"], o["demand"]) for o in book] == [("Arad", 700)]
+    assert rejected == 1
+    assert errors[0].startswith("line 3:")
+
+def test_read_orders_missing_column(cities):
+    book, rejected, errors = read_orders(io.StringIO("pickup,delivery\nArad,Bacau\n"), cities, fmt="csv")
+    assert len(book) == 0 and rejected == 1
+    assert errors == ["line 2: missing 'demand'"]
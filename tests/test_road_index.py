@@ -0,0 +1,50 @@
+import random
+
+import networkx as nx
+import pytest
+
+from graph_builder import attach_index, get_distance, get_duration, get_path
+from road_index import ContractionHierarchy, build_road_index, graph_fingerprint, load_road_index, save_road_index
+
+SAMPLE_PAIRS = 200
+
+@pytest.fixture(scope="module")
+def index(graph):
+    return build_road_index(graph)
+
+def _pairs(G):
+    rng = random.Random(7)
+    nodes = sorted(G.nodes)
+    pairs = [tuple(rng.sample(nodes, 2)) for _ in range(SAMPLE_PAIRS)]
+    pairs = [(a, b) for a, b in pairs if nx.has_path(G, a, b)]
+    assert len(pairs) > SAMPLE_PAIRS // 2
+    return pairs
+
+@pytest.mark.parametrize("weight", ["distance", "duration"])
+def test_ch_lengths_match_dijkstra(graph, index, weight):
+    for a, b in _pairs(graph):
+        assert index[weight].length(a, b) == pytest.approx(nx.dijkstra_path_length(graph, a, b, weight=weight))
+
+def test_ch_paths_are_real_shortest_paths(graph, index):
+    for a, b in _pairs(graph):
+        path = index["distance"].path(a, b)
+        assert path[0] == a and path[-1] == b
+        assert all(graph.has_edge(u, v) for u, v in zip(path, path[1:]))
+        assert nx.path_weight(graph, path, "distance") == pytest.approx(
+            nx.dijkstra_path_length(graph, a, b, weight="distance"))
+
+def test_indexed_queries_match_plain_graph(graph):
+    indexed = attach_index(graph.copy())
+    for a, b in _pairs(graph)[:50]:
+        assert get_distance(indexed, a, b) == pytest.approx(get_distance(graph, a, b))
+        assert get_duration(indexed, a, b) == pytest.approx(get_duration(graph, a, b))
+        assert get_path(indexed, a, b)[-1] == b
+
+def test_index_file_round_trip_and_stale_fingerprint(graph, index, tmp_path):
+    path = str(tmp_path / "index.json")
+    save_road_index(index, path, graph_fingerprint(graph))
+    loaded = load_road_index(path, graph_fingerprint(graph))
+    a, b = _pairs(graph)[0]
+    assert loaded["distance"].length(a, b) == pytest.approx(index["distance"].length(a, b))
+    assert isinstance(loaded["distance"], ContractionHierarchy)
+    assert load_road_index(path, "not-this-graph") is None
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from graph_builder import build_graph, load_network_for, reachable
+from road_network import compile_network, load_network, network_fingerprint, save_network
+
+CITIES = {c: {"coords": [45.0 + i, 25.0 + i]} for i, c in enumerate(["A", "B", "C", "D", "E"])}
+
+def _road(a, b, km=100, h=1.25, **extra):
+    return {"from": a, "to": b, "distance_km": km, "duration_hours": h, **extra}
+
+def _issues(network):
+    return [(i["issue"], i["from"], i["to"]) for i in network.issues]
+
+@pytest.mark.parametrize("road, issue", [
+    (_road("A", "Z"), "unknown_city"),
+    (_road("A", "A"), "self_loop"),
+    (_road("A", "B", km=None), "missing_length"),
+    (_road("A", "B", h="n/a"), "missing_length"),
+    (_road("A", "B", km=0), "zero_length"),
+    (_road("A", "B", h=-1), "zero_length"),
+    (_road("A", "B", km=100, h=50), "implausible_speed"),     # 2 km/h
+    (_road("A", "B", km=500, h=1), "implausible_speed"),      # 500 km/h
+])
+def test_bad_roads_are_dropped_and_recorded(road, issue):
+    network = compile_network([road, _road("C", "D")], CITIES)
+    assert _issues(network) == [(issue, road["from"], road["to"])]
+    assert [(a, b) for a, b, *_ in network.edges] == [("C", "D")]
+
+def test_duplicates_merge_to_the_minimum():
+    network = compile_network([_road("A", "B", km=120, h=1.5), _road("B", "A", km=100, h=1.6, speed_profile="rush")],
+                              CITIES)
+    assert network.edges == [("A", "B", 100, 1.5, "rush")]
+    assert _issues(network) == [("duplicate", "B", "A")]
+
+def test_components_and_reachability_on_a_disconnected_network(tmp_path):
+    roads = [_road("A", "B"), _road("B", "C"), _road("D", "E")]
+    network = compile_network(roads, CITIES)
+    assert network.reachable("A", "C") and network.reachable("D", "E")
+    assert not network.reachable("A", "D")
+    assert network.component_of("Z") == -1 and not network.reachable("A", "Z")
+    assert network.summary()["components"] == 2
+
+    road_file = tmp_path / "roads.json"
+    road_file.write_text(json.dumps(roads), encoding="utf-8")
+    G = build_graph(CITIES, str(road_file), profiles_file=None)
+    assert reachable(G, "A", "C") and not reachable(G, "C", "E")
+
+def test_compiled_network_is_rebuilt_when_stale(tmp_path):
+    road_file, net_file = tmp_path / "roads.json", tmp_path / "roads.network.json"
+    road_file.write_text(json.dumps([_road("A", "B")]), encoding="utf-8")
+    first = load_network_for(CITIES, str(road_file), str(net_file))
+    assert load_network(str(net_file), network_fingerprint([_road("A", "B")], CITIES)) is not None
+    assert not first.reachable("A", "C")
+
+    road_file.write_text(json.dumps([_road("A", "B"), _road("B", "C")]), encoding="utf-8")
+    second = load_network_for(CITIES, str(road_file), str(net_file))
+    assert second.reachable("A", "C")
+    saved = json.loads(net_file.read_text(encoding="utf-8"))
+    assert saved["fingerprint"] == network_fingerprint([_road("A", "B"), _road("B", "C")], CITIES)
+
+def test_saved_network_round_trips(tmp_path):
+    network = compile_network([_road("A", "B"), _road("A", "Z")], CITIES)
+    path = str(tmp_path / "net.json")
+    save_network(network, path, "fp")
+    loaded = load_network(path, "fp")
+    assert loaded.edges == network.edges and loaded.issues == network.issues
+    assert load_network(path, "other") is None
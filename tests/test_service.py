@@ -0,0 +1,93 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from service import PlanningService, make_server, _plan_args, BadRequest
+
+ORDER = {"pickup": "Bacau", "delivery": "Barlad", "demand": 1000}
+
+@pytest.mark.parametrize("body", [
+    None,
+    [],
+    {"orders": [ORDER]},
+    {"start_city": "Adjud", "orders": []},
+    {"start_city": "Adjud", "orders": [5]},
+    {"start_city": "Adjud", "orders": [{"pickup": "Bacau"}]},
+    {"start_city": "Adjud", "orders": [dict(ORDER, demand="lots")]},
+    {"start_city": "Adjud", "orders": [dict(ORDER, demand=0)]},
+    {"start_city": "Adjud", "orders": [dict(ORDER, time_limit_hrs=None)]},
+    {"start_city": "Adjud", "orders": [ORDER], "fleet": ["x"]},
+    {"start_city": "Adjud", "orders": [ORDER], "fleet": {"nume": "Truck"}},
+    {"start_city": "Adjud", "orders": [ORDER], "fleet": [{"nume": "Truck", "capacitate": "big"}]},
+    {"start_city": "Adjud", "orders": [ORDER], "departure_hour": "noon"},
+])
+def test_plan_args_rejects_malformed_bodies(body, coords):
+    with pytest.raises(BadRequest):
+        _plan_args(body, coords)
+
+def test_plan_args_sorts_urgent_first(coords):
+    args = _plan_args({"start_city": "Adjud", "orders": [ORDER, dict(ORDER, time_limit_hrs=5)]}, coords)
+    assert [o["id"] for o in args["pd_requests"]] == [2, 1]
+
+def test_plan_args_converts_numbers(coords):
+    fleet = [{"nume": "Truck", "capacitate": "25000", "numar": 2.0}]
+    args = _plan_args({"start_city": "Adjud", "orders": [dict(ORDER, demand="1000")], "fleet": fleet}, coords)
+    assert args["pd_requests"][0]["demand"] == 1000 and isinstance(args["pd_requests"][0]["demand"], int)
+    assert args["vehicle_profiles"][0]["capacitate"] == 25000 and args["vehicle_profiles"][0]["numar"] == 2
+    assert fleet[0]["capacitate"] == "25000"    # the caller's body is left as it was
+
+@pytest.fixture
+def server(coords):
+    service = PlanningService(coords, max_workers=1, index_path=None, network_path=None)
+    httpd = make_server(service, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+    service.shutdown()
+
+def _post(port, path, payload, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+    conn.request("POST", path, body=data, headers=headers or {})
+    resp = conn.getresponse()
+    out = resp.status, json.loads(resp.read() or b"null")
+    conn.close()
+    return out
+
+@pytest.mark.parametrize("payload", [
+    {"start_city": "Adjud", "orders": [5]},
+    {"start_city": "Adjud", "orders": [ORDER], "fleet": ["x"]},
+    {"start_city": "Adjud", "orders": [dict(ORDER, demand=1000.5)]},
+    {"start_city": "Adjud", "orders": [dict(ORDER, pickup="Bacaux")]},
+    {"start_city": "Adjudx", "orders": [ORDER]},
+    {"start_city": "Adjud", "orders": [ORDER], "fleet": [{"capacitate": 25000, "numar": 1, "end_city": "Nowhere"}]},
+    {"start_city": "Adjud", "orders": [ORDER], "fleet": [{"capacitate": 25000.5, "numar": 1}]},
+    b"{not json",
+])
+def test_bad_plan_requests_get_400(server, payload):
+    status, body = _post(server, "/plan", payload)
+    assert status == 400
+    assert "error" in body
+
+def test_bad_content_length_gets_400(server):
+    status, _ = _post(server, "/plan", {}, headers={"Content-Length": "abc"})
+    assert status == 400
+
+def test_insert_without_routes_gets_400(server):
+    status, _ = _post(server, "/insert", {"order": ORDER})
+    assert status == 400
+
+def test_unknown_path_gets_404(server):
+    status, _ = _post(server, "/nope", {})
+    assert status == 404
+
+def test_plan_round_trip(server):
+    fleet = [{"nume": "Truck", "capacitate": 25000, "echipaj": False, "numar": 1}]
+    status, job = _post(server, "/plan", {"start_city": "Adjud", "orders": [ORDER], "fleet": fleet})
+    assert status == 200
+    assert job["state"] == "done"
+    assert job["result"]["routes"][0]["traseu"][0]["oras"] == "Adjud"
@@ -0,0 +1,45 @@
+import io
+import json
+
+from snapshot import dumps_snapshot, dump_snapshot, loads_snapshot, load_snapshot, read_scenario
+
+TRUCK = {"nume": "Truck", "capacitate": 25000, "tahograf": True, "echipaj": False, "numar": 1}
+
+SCENARIO = {
+    "fleet": [TRUCK],
+    "orders": [
+        {"pickup": "Arad", "delivery": "Bacau", "demand": 1000, "time_limit_hrs": 24},
+        {"pickup": "Bacau", "delivery": "Barlad", "demand": 2500, "time_limit_hrs": 12.5, "part": 2},
+    ],
+    "routes": [
+        {"vehicul": TRUCK, "unitate": 0, "traseu": [
+            {"tip": "plecare", "oras": "Arad", "distanta": 0, "durata": 0, "comanda": None},
+            {"tip": "pickup", "oras": "Arad", "distanta": 12.25, "durata": 0.5, "order_id": 1, "demand": 1000,
+             "speed_profile": [1.0] * 24},
+            {"tip": "delivery", "oras": "Bacau", "distanta": 300.0, "durata": 4, "order_id": 1, "demand": 1000},
+        ]},
+        {"vehicul": dict(TRUCK), "unitate": 1, "traseu": []},
+    ],
+    "meta": {"cost": 312.25, "kpi": {"distance_km": 312.25}},
+}
+
+def _same(a, b):
+    # equal values and equal types (an int must not come back as a float)
+    assert json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+def test_round_trip_keeps_values_and_types():
+    _same(loads_snapshot(dumps_snapshot(SCENARIO)).to_dict(), SCENARIO)
+
+def test_file_round_trip_and_columns(tmp_path):
+    path = str(tmp_path / "scenario.vrps")
+    dump_snapshot(SCENARIO, path)
+    with load_snapshot(path) as snap:
+        assert list(snap.column("orders", "demand")) == [1000, 2500]
+        assert snap.rows("steps") == 3
+        _same(snap.to_dict(), SCENARIO)
+
+def test_read_scenario_accepts_snapshots_and_json(tmp_path):
+    path = tmp_path / "fleet.json"
+    path.write_text(json.dumps([TRUCK]), encoding="utf-8")
+    assert read_scenario(str(path)) == [TRUCK]
+    _same(read_scenario(io.BytesIO(dumps_snapshot({"fleet": [TRUCK]}))), {"fleet": [TRUCK]})
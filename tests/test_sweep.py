@@ -0,0 +1,58 @@
+import threading
+import time
+
+from orders import CityTable, OrderBook
+from portfolio import map_parallel, stop_requested
+from sweep import _run_variant, expand_grid
+
+FLEET = [{"nume": "Truck", "capacitate": 25000, "echipaj": False, "numar": 1}]
+
+def _data():
+    book = OrderBook(CityTable(["Arad", "Bacau"]))
+    book.append("Arad", "Bacau", 30000)
+    return {"start_city": "Arad", "fleet": FLEET, "orders": book, "coords": {}, "graph": None,
+            "pair_cache": {}, "solve_kwargs": {}}
+
+def test_expand_grid_crosses_axes():
+    variants = expand_grid({"mode": ["Economic", "Fast"], "fleet_counts": {"Truck": [1, 2, 3]}})
+    assert len(variants) == 6
+    assert {"mode": "Fast", "numar[Truck]": 2} in variants
+
+def test_variant_without_vehicles_is_an_error_row():
+    row = _run_variant(_data(), {"mode": "Economic", "numar[Truck]": 0})
+    assert row["error"] == "no vehicles in variant"
+
+def test_variant_with_zero_capacity_is_an_error_row():
+    row = _run_variant(_data(), {"mode": "Economic", "capacitate[Truck]": 0})
+    assert row["error"] == "no vehicle capacity in variant"
+
+def _nap(data, seconds):
+    time.sleep(seconds)
+    return seconds
+
+def test_map_parallel_stops_when_asked():
+    stop = threading.Event()
+    stop.set()
+    start = time.time()
+    results = map_parallel(_nap, None, [5] * 4, max_workers=2, should_stop=stop.is_set)
+    assert time.time() - start < 4
+    assert results == [None] * 4
+
+def test_map_parallel_keeps_task_order():
+    assert map_parallel(_nap, None, [0.2, 0.0, 0.1], max_workers=3) == [0.2, 0.0, 0.1]
+
+def _wait_for_stop(data, seconds):
+    deadline = time.time() + seconds
+    while time.time() < deadline and not stop_requested():
+        time.sleep(0.01)
+    return stop_requested()
+
+def test_map_parallel_tells_running_workers_to_stop():
+    start = time.time()
+    results = map_parallel(_wait_for_stop, None, [10] * 2, max_workers=2, should_stop=lambda: time.time() - start > 1)
+    assert time.time() - start < 5
+    assert results == [True, True]
+
+def test_pool_outlives_a_run():
+    assert map_parallel(_nap, None, [0.0], max_workers=2) == [0.0]
+    assert map_parallel(_nap, {"other": "data"}, [0.1], max_workers=2) == [0.1]
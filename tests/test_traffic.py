@@ -0,0 +1,97 @@
+import networkx as nx
+import pytest
+from ortools.constraint_solver import pywrapcp
+
+from graph_builder import get_duration, get_duration_at
+from timeline import build_timeline
+from traffic import HOURS_PER_DAY, TravelTimeCache, duration_at, hour_bucket, profile_factor
+from vrp_solver import DEFAULT_SERVICE_TIME, SECONDS_PER_HOUR, _build_model, solve_vrp
+
+RUSH = [1.0] * HOURS_PER_DAY
+RUSH[7], RUSH[8], RUSH[23] = 1.5, 2.0, 3.0
+
+def test_profile_factor_interpolates_between_hours():
+    assert profile_factor(RUSH, 8) == 2.0
+    assert profile_factor(RUSH, 7.5) == pytest.approx(1.75)
+    assert profile_factor(RUSH, 8.25) == pytest.approx(1.75)
+    assert profile_factor(None, 8) == 1.0
+    assert duration_at(2.0, RUSH, 8) == 4.0
+
+def test_profile_factor_wraps_daily():
+    assert profile_factor(RUSH, 23.5) == pytest.approx(2.0)     # halfway from 23:00 (3.0) to 0:00 (1.0)
+    assert profile_factor(RUSH, 32) == profile_factor(RUSH, 8)
+    assert profile_factor(RUSH, -16) == profile_factor(RUSH, 8)
+    assert hour_bucket(31.9) == 7
+
+def test_travel_time_cache_buckets_and_shares():
+    calls = []
+    def query(a, b, hour):
+        calls.append((a, b, hour))
+        return 1.0 + hour
+    buckets = {}
+    cache = TravelTimeCache(query, buckets)
+    assert cache.duration("A", "B", 8.2) == 9.0
+    assert cache.duration("A", "B", 8.9) == 9.0         # same bucket: read, not recomputed
+    assert cache.duration("A", "A", 8.0) == 0.0
+    assert calls == [("A", "B", 8.0)]                    # queried at the bucket's start hour
+    assert cache.matrix(["A", "B"], 32.5) == [[0.0, 9.0], [9.0, 0.0]]
+    assert len(cache) == 4                               # (A,B) (A,A) (B,A) (B,B), all in bucket 8
+
+    TravelTimeCache(lambda a, b, h: pytest.fail("shared bucket recomputed"), buckets).duration("A", "B", 8.5)
+
+def test_time_dependent_dijkstra_matches_static_with_flat_profiles(graph):
+    flat = graph.copy()
+    for _, _, d in flat.edges(data=True):
+        d["speed_profile"] = [1.0] * HOURS_PER_DAY
+    flat.graph["time_dependent"] = True
+    for a, b in [("Adjud", "Arad"), ("Bacau", "Barlad"), ("Iasi", "Timisoara")]:
+        assert get_duration_at(flat, a, b, 8.0) == pytest.approx(get_duration(graph, a, b))
+
+def test_time_dependent_dijkstra_slows_down_in_rush_hour(graph):
+    rush = graph.copy()
+    for _, _, d in rush.edges(data=True):
+        d["speed_profile"] = [2.0] * HOURS_PER_DAY
+    rush.graph["time_dependent"] = True
+    assert get_duration_at(rush, "Adjud", "Arad", 8.0) == pytest.approx(2 * get_duration(graph, "Adjud", "Arad"))
+    with pytest.raises(nx.NodeNotFound):
+        get_duration_at(rush, "Adjud", "Atlantis", 8.0)
+
+def test_time_dimension_reads_the_bucket_each_node_is_left_in():
+    # yard A -> pickup B -> delivery C -> A; legs left from the yard use bucket 8, the rest bucket 9
+    slow = [[0, 10, 10], [10, 0, 10], [10, 10, 0]]
+    fast = [[0, 1, 1], [1, 0, 2], [3, 1, 0]]
+    data = {"N": 3, "vehicle_count": 1, "starts": [0], "finishes": [0], "node_city": [0, 1, 2],
+            "demands": [0, 100, -100], "capacities": [1000], "unit_type": [0], "pairs": [(1, 2)],
+            "time_mode": True, "dist_m": slow, "time_m": slow,
+            "td_h": {8: fast, 9: [[0, 10, 10], [10, 0, 2], [3, 10, 0]]}, "node_bucket": [8, 9, 9]}
+    manager, routing, _ = _build_model(data)
+    p = pywrapcp.DefaultRoutingSearchParameters()
+    solution = routing.SolveWithParameters(p)
+    time_dim = routing.GetDimensionOrDie("Time")
+    end = solution.Value(time_dim.CumulVar(routing.End(0)))
+    assert end == int((1 + 2 + 3 + 3 * DEFAULT_SERVICE_TIME) * SECONDS_PER_HOUR)
+
+def _route(departure_hour=None):
+    route = {"vehicul": {"nume": "Truck", "echipaj": False},
+             "traseu": [{"tip": "plecare", "oras": "A", "distanta": 0, "durata": 0},
+                        {"tip": "intermediar", "oras": "B", "distanta": 80, "durata": 1.0, "speed_profile": RUSH}]}
+    if departure_hour is not None:
+        route["departure_hour"] = departure_hour
+    return route
+
+def test_timeline_rescales_profiled_legs_by_departure_hour():
+    def arrival(route):
+        rows, _ = build_timeline([route])
+        return max(r["elapsed_h"] for r in rows)
+    static = arrival(_route())
+    assert arrival(_route(departure_hour=3)) == pytest.approx(static)       # factor 1.0 at night
+    assert arrival(_route(departure_hour=8)) == pytest.approx(static + 1.0)  # factor 2.0 at 8:00
+
+def test_solve_with_departure_hour_uses_time_dependent_legs(coords, graph):
+    orders = [{"id": 1, "pickup": "Bacau", "delivery": "Bucuresti", "demand": 1000, "time_limit_hrs": 80}]
+    fleet = [{"nume": "Truck", "capacitate": 25000, "echipaj": False, "numar": 1}]
+    metrics = {}
+    routes, _, _ = solve_vrp("Adjud", orders, coords, fleet, "Economic", graph=graph, departure_hour=8,
+                             metrics=metrics)
+    assert metrics["values"]["td_buckets"] >= 1
+    assert routes[0]["departure_hour"] == 8
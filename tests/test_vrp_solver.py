@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from jobs import JobRunner
+from vrp_solver import solve_vrp, SolveCancelled
+
+ORDERS = [
+    {"id": 1, "pickup": "Bacau", "delivery": "Barlad", "demand": 1000, "time_limit_hrs": 40},
+    {"id": 2, "pickup": "Arad", "delivery": "Ilia", "demand": 1000, "time_limit_hrs": 80},
+]
+
+def _truck(**extra):
+    return {"nume": "Truck", "capacitate": 25000, "echipaj": False, "numar": 1, **extra}
+
+def _stops(route):
+    return [s["oras"] for s in route["traseu"] if s["tip"] != "intermediar"]
+
+def _served(routes):
+    return sorted(s["order_id"] for r in routes for s in r["traseu"] if s["tip"] == "delivery")
+
+def test_open_route_ends_at_last_delivery(coords, graph):
+    routes, _, cost = solve_vrp("Adjud", ORDERS[:1], coords, [_truck(open_route=True)], "Economic", graph=graph)
+    assert _stops(routes[0]) == ["Adjud", "Bacau", "Barlad"]
+    assert cost > 0
+
+def test_distinct_end_yard(coords, graph):
+    routes, _, _ = solve_vrp("Adjud", ORDERS[:1], coords, [_truck(end_city="Arad")], "Economic", graph=graph)
+    assert _stops(routes[0])[0] == "Adjud"
+    assert _stops(routes[0])[-1] == "Arad"
+
+def test_multi_depot_and_open_routes_in_one_solve(coords, graph):
+    fleet = [_truck(start_city="Arad", end_city="Timisoara"), _truck(open_route=True)]
+    routes, _, _ = solve_vrp("Adjud", ORDERS, coords, fleet, "Economic", graph=graph)
+    assert _served(routes) == [1, 2]
+    for r in routes:
+        veh = r["vehicul"]
+        assert _stops(r)[0] == veh.get("start_city", "Adjud")
+        if veh.get("end_city"):
+            assert _stops(r)[-1] == veh["end_city"]
+
+def test_cancel_before_search_raises(coords, graph):
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(SolveCancelled):
+        solve_vrp("Adjud", ORDERS, coords, [_truck()], "Economic", graph=graph, cancel_event=cancel)
+
+def test_progress_reports_partial_routes(coords, graph):
+    updates = []
+    solve_vrp("Adjud", ORDERS, coords, [_truck()], "Economic", graph=graph, progress=updates.append)
+    assert updates and all("routes" in u for u in updates)
+    assert set(updates[-1]["routes"][0]) >= {"Bacau", "Barlad", "Arad", "Ilia"}
+
+def test_cancelled_job_is_reported_as_cancelled():
+    runner = JobRunner(max_workers=1)
+    def fn(progress=None, cancel_event=None):
+        cancel_event.wait(5)
+        raise SolveCancelled("solve cancelled")
+    job_id = runner.submit("s", fn)
+    time.sleep(0.1)
+    runner.cancel(job_id)
+    runner.wait(job_id, timeout=5)
+    assert runner.status(job_id)["state"] == "cancelled"
+
+def test_portfolio_cancel_takes_effect_within_a_round(coords, graph):
+    cancel = threading.Event()
+    threading.Timer(1.0, cancel.set).start()
+    start = time.time()
+    routes, _, _ = solve_vrp("Adjud", ORDERS, coords, [_truck()], "Economic", graph=graph,
+                             portfolio_workers=2, cancel_event=cancel)
+    assert time.time() - start < 4
+    assert _served(routes) == [1, 2]
+
+def test_several_units_of_one_type_solve_with_the_search(coords, graph):
+    cities = ["Bacau", "Barlad", "Arad", "Ilia", "Iasi", "Suceava", "Brasov", "Sibiu", "Cluj-Napoca", "Oradea"]
+    orders = [{"id": i, "pickup": cities[2*i], "delivery": cities[2*i + 1], "demand": 1000, "time_limit_hrs": 80}
+              for i in range(5)]
+    metrics = {}
+    routes, _, _ = solve_vrp("Adjud", orders, coords, [_truck(numar=6)], "Economic", graph=graph,
+                             metrics=metrics)
+    assert metrics["values"]["solution_found"]
+    assert _served(routes) == [0, 1, 2, 3, 4]
+    # units of a type are taken lowest first
+    used = sorted(r["unitate"] for r in routes)
+    assert used == list(range(len(used)))
+
+def test_construction_warm_start_is_accepted(coords, graph):
+    # routes from the construction heuristic must be a valid first solution of the model
+    pairs = [("Miercurea Ciuc", "Odorheiu Secuiesc", 431), ("Galati", "Resita", 4080), ("Moisei", "Hateg", 4004),
+             ("Mangalia", "Sighisoara", 7404), ("Deva", "Reghin", 1240), ("Giurgiu", "Buzau", 6291),
+             ("Bistrita", "Suceava", 6648), ("Gaesti", "Saratel", 5876)]
+    orders = [{"id": i, "pickup": a, "delivery": b, "demand": kg, "time_limit_hrs": 80}
+              for i, (a, b, kg) in enumerate(pairs)]
+    metrics = {}
+    solve_vrp("Adjud", orders, coords, [_truck(numar=2, capacitate=20000)], "Economic", graph=graph,
+              metrics=metrics)
+    assert metrics["values"]["warm_start"] is True
@@ -0,0 +1,67 @@
+import json
+import os
+
+__all__ = ["load_speed_profiles", "profile_factor", "duration_at", "hour_bucket", "TravelTimeCache"]
+
+# constants
+HOURS_PER_DAY = 24
+SPEED_PROFILES_FILE = "speed_profiles.json"
+
+def load_speed_profiles(path=SPEED_PROFILES_FILE):
+    """Named per-hour duration factors ({name: [24 floats]}); empty if the file is missing."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        profiles = json.load(f)
+    for name, factors in profiles.items():
+        if len(factors) != HOURS_PER_DAY:
+            raise ValueError(f"speed profile {name!r} needs {HOURS_PER_DAY} hourly factors")
+    return profiles
+
+def profile_factor(profile, hour):
+    """Duration multiplier at clock `hour` (any float, wraps daily).
+
+    factors[h] holds at h:00 and is interpolated linearly up to the next hour,
+    so a later departure never arrives much earlier (close to FIFO).
+    """
+    if not profile:
+        return 1.0
+    h = hour % HOURS_PER_DAY
+    i = int(h)
+    frac = h - i
+    return profile[i] * (1 - frac) + profile[(i + 1) % HOURS_PER_DAY] * frac
+
+def duration_at(base_hours, profile, hour):
+    """Travel time of an edge with static `base_hours` entered at clock `hour`."""
+    return base_hours * profile_factor(profile, hour)
+
+def hour_bucket(hour):
+    return int(hour) % HOURS_PER_DAY
+
+class TravelTimeCache:
+    """City-pair durations per departure-hour bucket, computed once per (bucket, pair).
+
+    `query(a, b, hour)` is the time-dependent shortest duration (graph_builder
+    get_duration_at); every departure inside one bucket reads the value for
+    the bucket's start hour, so a solve touches at most 24 matrices. Pass a
+    shared `buckets` dict to keep the values across caches.
+    """
+
+    def __init__(self, query, buckets=None):
+        self._query = query
+        self._buckets = {} if buckets is None else buckets
+
+    def duration(self, a, b, hour):
+        bucket = hour_bucket(hour)
+        pairs = self._buckets.setdefault(bucket, {})
+        d = pairs.get((a, b))
+        if d is None:
+            d = pairs[(a, b)] = 0.0 if a == b else self._query(a, b, float(bucket))
+        return d
+
+    def matrix(self, cities, hour):
+        """Duration matrix (hours) over `cities` for departures in the bucket of `hour`."""
+        return [[self.duration(a, b, hour) for b in cities] for a in cities]
+
+    def __len__(self):
+        return sum(len(p) for p in self._buckets.values())
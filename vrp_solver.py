@@ -1,8 +1,16 @@
 from math import radians, sin, cos, sqrt, atan2
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
-from graph_builder import build_graph, get_distance, get_duration, get_path
-
-__all__ = ["solve_vrp"]
+from graph_builder import build_graph, get_distance, get_duration, get_duration_at, get_path, reachable
+from instrumentation import collect, stage, incr, set_value
+from fleet import vehicle_types, expand_fleet
+from construction import regret_insertion, NEIGHBOUR_COUNT
+from spatial_index import KDTree
+from traffic import TravelTimeCache, hour_bucket
+from portfolio import run_portfolio, stop_requested
+from kpi import plan_cost
+from load_profile import stamp_loads
+
+__all__ = ["solve_vrp", "warm_pair_cache", "SolveCancelled"]
 
 # constants
 SECONDS_PER_HOUR = 3600
@@ -13,12 +21,42 @@ TIME_WINDOW_COEFFICIENT = 100
 SOLVER_TIME_LIMIT_SECONDS = 10
 TIME_OPTIMIZATION_LIMIT_SECONDS = 20
 FALLBACK_SPEED_KMPH = 60           # used if graph has no path
+ROAD_INDEX_FILE = "roads.index.json"  # contraction-hierarchy cache next to roads.json
+ROAD_NETWORK_FILE = "roads.network.json"  # validated network compiled from roads.json + coords.json
+
+# portfolio search: (first solution strategy, metaheuristic) per worker, cycled
+PORTFOLIO_CONFIGS = [
+    ("PATH_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+    ("PARALLEL_CHEAPEST_INSERTION", "GUIDED_LOCAL_SEARCH"),
+    ("SAVINGS", "SIMULATED_ANNEALING"),
+    ("LOCAL_CHEAPEST_INSERTION", "TABU_SEARCH"),
+    ("PATH_CHEAPEST_ARC", "SIMULATED_ANNEALING"),
+    ("GLOBAL_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+    ("PARALLEL_CHEAPEST_INSERTION", "TABU_SEARCH"),
+    ("CHRISTOFIDES", "GENERIC_TABU_SEARCH"),
+]
+PORTFOLIO_ROUNDS = 2
+GLS_LAMBDA_STEP = 0.05             # GLS penalty factor offset per lap over PORTFOLIO_CONFIGS (seeded variety)
 
 # encourage chaining multiple orders on same truck
 VEHICLE_STARTUP_COST_KM = 200      # penalty to open a vehicle when cost=distance
 VEHICLE_STARTUP_COST_HOURS = 2     # penalty to open a vehicle when cost=time
 
 # helpers
+class SolveCancelled(Exception):
+    """Raised when a solve is cancelled before its search has a plan to keep."""
+
+def _check_cancel(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise SolveCancelled("solve cancelled")
+
+def _vehicle_ends(vp, start_city, open_routes=False):
+    # (start, end) yard of one vehicle; end is None for an open-ended route
+    v_start = vp.get("start_city") or start_city
+    if open_routes or vp.get("open_route", False):
+        return v_start, None
+    return v_start, vp.get("end_city") or v_start
+
 def _haversine_km(a, b):
     R = 6371.0
     lat1, lon1 = map(radians, a)
@@ -29,6 +67,9 @@ def _haversine_km(a, b):
     return 2 * R * atan2(sqrt(x), sqrt(1-x))
 
 def _safe_graph_distance(G, coords, ci, cj):
+    if not reachable(G, ci, cj):
+        incr("unreachable_pairs")
+        return _haversine_km(coords[ci]['coords'], coords[cj]['coords'])
     try:
         return get_distance(G, ci, cj)
     except Exception:
@@ -36,6 +77,8 @@ def _safe_graph_distance(G, coords, ci, cj):
         return _haversine_km(pa, pb)
 
 def _safe_graph_duration(G, coords, ci, cj):
+    if not reachable(G, ci, cj):
+        return _haversine_km(coords[ci]['coords'], coords[cj]['coords']) / max(FALLBACK_SPEED_KMPH, 1e-6)
     try:
         return get_duration(G, ci, cj)
     except Exception:
@@ -43,12 +86,23 @@ def _safe_graph_duration(G, coords, ci, cj):
         dist = _haversine_km(pa, pb)
         return dist / max(FALLBACK_SPEED_KMPH, 1e-6)
 
+def _safe_graph_duration_at(G, coords, ci, cj, hour):
+    if not reachable(G, ci, cj):
+        return _safe_graph_duration(G, coords, ci, cj)
+    try:
+        return get_duration_at(G, ci, cj, hour)
+    except Exception:
+        return _safe_graph_duration(G, coords, ci, cj)
+
 def _expand_leg_to_steps(G, coords, a, b, step_type_on_arrival, order_meta=None):
     # per-segment steps along shortest path a->b; mark pickup/delivery only on final node b
     try:
         seg_path = get_path(G, a, b)
     except Exception:
         seg_path = [a, b]
+    if len(seg_path) < 2:
+        # consecutive stops in the same city still need their arrival row
+        seg_path = [a, b]
 
     steps = []
     poly_coords = [coords[seg_path[0]]['coords']]
@@ -59,6 +113,9 @@ def _expand_leg_to_steps(G, coords, a, b, step_type_on_arrival, order_meta=None)
         th = _safe_graph_duration(G, coords, prev_city, city)
 
         row = {'tip': "intermediar", 'oras': city, 'distanta': dkm, 'durata': th}
+        if G.has_edge(prev_city, city) and G.edges[prev_city, city].get('speed_profile'):
+            # the timeline rescales `durata` by the hour it drives this edge
+            row['speed_profile'] = G.edges[prev_city, city]['speed_profile']
 
         # only last node of the leg gets pickup/delivery/return semantics
         if i == len(seg_path) - 1:
@@ -69,6 +126,7 @@ def _expand_leg_to_steps(G, coords, a, b, step_type_on_arrival, order_meta=None)
                 row['comanda'] = oid
                 row['order_pickup'] = order_meta.get('pickup')
                 row['order_delivery'] = order_meta.get('delivery')
+                row['demand'] = order_meta.get('demand')
                 # including deadline on BOTH pickup and delivery, so the table knows it early
                 row['time_limit'] = order_meta.get('time_limit_hrs')
 
@@ -76,221 +134,491 @@ def _expand_leg_to_steps(G, coords, a, b, step_type_on_arrival, order_meta=None)
         poly_coords.append(coords[city]['coords'])
     return steps, poly_coords
 
-def _estimate_leg_hours(G, coords, a, b):
-    try:
-        return _safe_graph_duration(G, coords, a, b)
-    except Exception:
-        pa, pb = coords[a]['coords'], coords[b]['coords']
-        d = _haversine_km(pa, pb)
-        return d / max(FALLBACK_SPEED_KMPH, 1e-6)
-
-# solver
-def solve_vrp(start_city, pd_requests, coords, vehicle_profiles, routing_mode, allow_split=True, src_map=None):
-    pickups = [r['pickup'] for r in pd_requests]
-    deliveries = [r['delivery'] for r in pd_requests]
-    cities = [start_city] + list(dict.fromkeys(pickups + deliveries))
-
-    G = build_graph(coords)
-    n = len(cities)
-    city_index = {c: i for i, c in enumerate(cities)}
-    dist_m = [[0]*n for _ in range(n)]
-    time_m = [[0]*n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                d = t = 0
-            else:
-                a, b = cities[i], cities[j]
-                d = _safe_graph_distance(G, coords, a, b)
-                t = _safe_graph_duration(G, coords, a, b)
-            dist_m[i][j] = int(round(d))
-            time_m[i][j] = int(round(t))
-
-    vehicle_count = max(1, len(vehicle_profiles))
-    capacities = [vp['capacitate'] for vp in vehicle_profiles] if vehicle_profiles else [10**9]
-
-    # node list: depot + (pickup, delivery)
-    node_list = [start_city]
-    node_types = ['depot']
-    order_idx = [-1]
-    for i, order in enumerate(pd_requests):
-        node_list += [order['pickup'], order['delivery']]
-        node_types += ['pickup', 'delivery']
-        order_idx += [i, i]
-
-    N = len(node_list)
-    manager = pywrapcp.RoutingIndexManager(N, vehicle_count, 0)
+def _route_steps(G, coords, pd_requests, v_start, v_end, stops):
+    # stops: [(order index, 'pickup' | 'delivery'), ...]; v_end None => open route
+    steps = [{'tip': 'plecare', 'oras': v_start, 'distanta': 0, 'durata': 0, 'comanda': None}]
+    polyline = []
+    cur = v_start
+    for oid, kind in stops:
+        o = pd_requests[oid]
+        leg_steps, leg_poly = _expand_leg_to_steps(G, coords, cur, o[kind], kind, order_meta=o)
+        steps += leg_steps; polyline += (leg_poly if not polyline else leg_poly[1:]); cur = o[kind]
+
+    if v_end is not None and cur != v_end:
+        leg_steps, leg_poly = _expand_leg_to_steps(G, coords, cur, v_end, "intoarcere", order_meta=None)
+        steps += leg_steps; polyline += (leg_poly if not polyline else leg_poly[1:])
+    return steps, polyline
+
+def _stamp_departure(routes, departure_hour):
+    # the timeline replays speed profiles from this clock hour
+    if departure_hour is not None:
+        for r in routes:
+            r['departure_hour'] = departure_hour
+
+def _construct(coords, cities, city_index, cost_m, pd_requests, vehicle_profiles, unit_type, ends, open_cost):
+    # regret insertion on the precomputed matrix; routes shortlisted with a KD-tree over the cities
+    tree = KDTree.from_coords(coords, cities)
+    near = {}
+    def neighbours(ci):
+        if ci not in near:
+            near[ci] = {city_index[c] for c in tree.nearest(coords[cities[ci]]['coords'], NEIGHBOUR_COUNT)}
+        return near[ci]
+
+    orders = [(city_index[o['pickup']], city_index[o['delivery']], o.get('demand', 0)) for o in pd_requests]
+    vehicles = [{'start': city_index[s], 'end': city_index[e] if e is not None else None,
+                 'capacity': vp.get('capacitate', 10**9)}
+                for vp, (s, e) in zip(vehicle_profiles, ends)]
+    priority = [float(o.get("time_limit_hrs", MAX_TIME_LIMIT)) for o in pd_requests]
+    return regret_insertion(cost_m, orders, vehicles, unit_type, neighbours, priority, open_cost)
+
+def _build_model(data):
+    # OR-Tools model from the plain `data` dict: (manager, routing, callback call counter)
+    N, vehicle_count = data["N"], data["vehicle_count"]
+    node_city, time_m, dist_m = data["node_city"], data["time_m"], data["dist_m"]
+    td_h, node_bucket = data["td_h"], data["node_bucket"]
+
+    def leg_seconds(fi, ci, cj):
+        # driving time of a leg left from node fi; bucketed by departure hour when time-dependent
+        if td_h is not None:
+            return int(td_h[node_bucket[fi]][ci][cj] * SECONDS_PER_HOUR)
+        return int(time_m[ci][cj] * SECONDS_PER_HOUR)
+
+    cb_calls = [0]  # transit/unary callback invocations, reported after the search
+    manager = pywrapcp.RoutingIndexManager(N, vehicle_count, data["starts"], data["finishes"])
     routing = pywrapcp.RoutingModel(manager)
 
     # arc cost
-    time_mode = routing_mode in ("Timp minim", "Fast")
-    if time_mode:
+    if data["time_mode"]:
         def time_cb(from_index, to_index):
-            fi = manager.IndexToNode(from_index); ti = manager.IndexToNode(to_index)
-            a = node_list[fi]; b = node_list[ti]
-            return int(time_m[city_index[a]][city_index[b]] * SECONDS_PER_HOUR)
+            cb_calls[0] += 1
+            fi = manager.IndexToNode(from_index)
+            ci = node_city[fi]; cj = node_city[manager.IndexToNode(to_index)]
+            if ci < 0 or cj < 0:
+                return 0
+            return leg_seconds(fi, ci, cj)
         cb = routing.RegisterTransitCallback(time_cb)
         routing.SetArcCostEvaluatorOfAllVehicles(cb)
-        routing.SetFixedCostOfAllVehicles(int(VEHICLE_STARTUP_COST_HOURS * SECONDS_PER_HOUR))
+        fixed_cost = int(VEHICLE_STARTUP_COST_HOURS * SECONDS_PER_HOUR)
     else:
         def dist_cb(from_index, to_index):
-            fi = manager.IndexToNode(from_index); ti = manager.IndexToNode(to_index)
-            a = node_list[fi]; b = node_list[ti]
-            return int(dist_m[city_index[a]][city_index[b]] * METERS_PER_KM)
+            cb_calls[0] += 1
+            ci = node_city[manager.IndexToNode(from_index)]; cj = node_city[manager.IndexToNode(to_index)]
+            if ci < 0 or cj < 0:
+                return 0
+            return int(dist_m[ci][cj] * METERS_PER_KM)
         cb = routing.RegisterTransitCallback(dist_cb)
         routing.SetArcCostEvaluatorOfAllVehicles(cb)
-        routing.SetFixedCostOfAllVehicles(int(VEHICLE_STARTUP_COST_KM * METERS_PER_KM))
+        fixed_cost = int(VEHICLE_STARTUP_COST_KM * METERS_PER_KM)
 
-    # capacity (kg)
-    demands = [0]*N
-    for i, t in enumerate(node_types):
-        if t == 'pickup':
-            demands[i] = pd_requests[order_idx[i]]['demand']
-        elif t == 'delivery':
-            demands[i] = -pd_requests[order_idx[i]]['demand']
+    # identical units are interchangeable: a tie-break of one cost unit per rank within the type makes
+    # the search prefer the lowest free unit (a hard "k+1 only if k" constraint starves first solutions)
+    unit_type, rank = data["unit_type"], 0
+    for v in range(vehicle_count):
+        rank = rank + 1 if v and unit_type[v] == unit_type[v - 1] else 0
+        routing.SetFixedCostOfVehicle(fixed_cost + rank, v)
 
+    # capacity (kg)
+    demands = data["demands"]
     def demand_cb(index):
+        cb_calls[0] += 1
         node = manager.IndexToNode(index)
         return demands[node]
 
     dcb = routing.RegisterUnaryTransitCallback(demand_cb)
-    routing.AddDimensionWithVehicleCapacity(dcb, 0, capacities, True, 'Capacity')
-    cap_dim = routing.GetDimensionOrDie('Capacity')
-
-    # pickup-delivery constraints
-    for i, _ in enumerate(pd_requests):
-        p = 1 + 2*i
-        d = 1 + 2*i + 1
-        routing.AddPickupAndDelivery(manager.NodeToIndex(p), manager.NodeToIndex(d))
-        routing.solver().Add(
-            routing.VehicleVar(manager.NodeToIndex(p)) == routing.VehicleVar(manager.NodeToIndex(d))
-        )
-        routing.solver().Add(
-            cap_dim.CumulVar(manager.NodeToIndex(p)) <= cap_dim.CumulVar(manager.NodeToIndex(d))
-        )
+    routing.AddDimensionWithVehicleCapacity(dcb, 0, data["capacities"], True, 'Capacity')
 
     svc = [int(DEFAULT_SERVICE_TIME * SECONDS_PER_HOUR)] * N
     def full_time_cb(from_index, to_index):
-        fi = manager.IndexToNode(from_index); ti = manager.IndexToNode(to_index)
-        a = node_list[fi]; b = node_list[ti]
-        return int(time_m[city_index[a]][city_index[b]] * SECONDS_PER_HOUR + svc[fi])
+        cb_calls[0] += 1
+        fi = manager.IndexToNode(from_index)
+        ci = node_city[fi]; cj = node_city[manager.IndexToNode(to_index)]
+        if ci < 0 or cj < 0:
+            return 0
+        return leg_seconds(fi, ci, cj) + svc[fi]
 
     ft_idx = routing.RegisterTransitCallback(full_time_cb)
     routing.AddDimension(ft_idx, 0, int(MAX_TIME_LIMIT * SECONDS_PER_HOUR), True, 'Time')
     time_dim = routing.GetDimensionOrDie('Time')
-    for i in range(N):
-        idx = manager.NodeToIndex(i)
+    # by routing index: end-only yards and the open-route sink have no node index (NodeToIndex -> -1)
+    for idx in list(range(routing.Size())) + [routing.End(v) for v in range(vehicle_count)]:
         time_dim.CumulVar(idx).SetRange(0, int(MAX_TIME_LIMIT * SECONDS_PER_HOUR))
     time_dim.SetGlobalSpanCostCoefficient(TIME_WINDOW_COEFFICIENT)
 
-    # search params
+    # pickup-delivery constraints: same vehicle, pickup first (service time keeps the Time cumul increasing)
+    for p, d in data["pairs"]:
+        pi, di = manager.NodeToIndex(p), manager.NodeToIndex(d)
+        routing.AddPickupAndDelivery(pi, di)
+        routing.solver().Add(routing.VehicleVar(pi) == routing.VehicleVar(di))
+        routing.solver().Add(time_dim.CumulVar(pi) <= time_dim.CumulVar(di))
+    return manager, routing, cb_calls
+
+def _search_params(time_mode, config=None, seed=0, time_limit=None):
+    # default: the single-search settings; config = (first solution strategy, metaheuristic) names
     p = pywrapcp.DefaultRoutingSearchParameters()
-    p.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
-    if time_mode:
-        p.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
-        p.time_limit.seconds = TIME_OPTIMIZATION_LIMIT_SECONDS
+    if config is None:
+        p.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+        if time_mode:
+            p.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
     else:
-        p.time_limit.seconds = SOLVER_TIME_LIMIT_SECONDS
-
-    solution = routing.SolveWithParameters(p)
-
-    # fallback (chained, per-vehicle)
+        first, meta = config
+        p.first_solution_strategy = getattr(routing_enums_pb2.FirstSolutionStrategy, first)
+        p.local_search_metaheuristic = getattr(routing_enums_pb2.LocalSearchMetaheuristic, meta)
+        p.guided_local_search_lambda_coefficient += GLS_LAMBDA_STEP * (seed // len(PORTFOLIO_CONFIGS))
+    if time_limit is None:
+        time_limit = TIME_OPTIMIZATION_LIMIT_SECONDS if time_mode else SOLVER_TIME_LIMIT_SECONDS
+    p.time_limit.FromMilliseconds(int(time_limit * 1000))
+    return p
+
+def _route_indices(manager, node_routes):
+    # warm-start routes are node ids; OR-Tools reads routing indices (they differ once a yard is end-only)
+    return [[manager.NodeToIndex(n) for n in nodes] for nodes in node_routes]
+
+def _stop_cities(data, node_routes):
+    # city names of each vehicle's stops (the partial plan shown while a search runs)
+    cities, node_city = data["cities"], data["node_city"]
+    return [[cities[node_city[n]] for n in nodes if node_city[n] >= 0] for nodes in node_routes]
+
+def _initial_assignment(manager, routing, p, init_routes):
+    # the construction routes as a first solution, or None when the model rejects them
+    if init_routes is None:
+        return None
+    routing.CloseModelWithParameters(p)
+    return routing.ReadAssignmentFromRoutes(_route_indices(manager, init_routes), True)
+
+def _node_routes(routing, manager, solution):
+    # visited nodes per vehicle (yards and sink excluded)
+    out = []
+    for vid in range(routing.vehicles()):
+        nodes = []
+        index = solution.Value(routing.NextVar(routing.Start(vid)))
+        while not routing.IsEnd(index):
+            nodes.append(manager.IndexToNode(index))
+            index = solution.Value(routing.NextVar(index))
+        out.append(nodes)
+    return out
+
+def _solve_single(data, init_routes, progress=None, cancel_event=None):
+    # one in-process search: (node routes, objective) or (None, None)
+    with stage("model_setup"):
+        manager, routing, cb_calls = _build_model(data)
+        p = _search_params(data["time_mode"])
+
+    # cancellation: a search limit polled throughout the search (plateaus included), not only on solutions
+    if cancel_event is not None:
+        routing.AddSearchMonitor(routing.solver().CustomLimit(cancel_event.is_set))
+
+    # progress reporting: every improving solution, with the partial routes it describes
+    if progress is not None:
+        found = [0]
+        def on_solution():
+            found[0] += 1
+            current = []
+            for vid in range(routing.vehicles()):
+                nodes, index = [], routing.NextVar(routing.Start(vid)).Value()
+                while not routing.IsEnd(index):
+                    nodes.append(manager.IndexToNode(index))
+                    index = routing.NextVar(index).Value()
+                current.append(nodes)
+            progress({"solutions": found[0], "objective": routing.CostVar().Value(),
+                      "routes": _stop_cities(data, current)})
+        routing.AddAtSolutionCallback(on_solution)
+
+    # first solution from the construction heuristic (same one the fallback uses)
+    initial = _initial_assignment(manager, routing, p, init_routes)
+    if init_routes is not None:
+        set_value("warm_start", initial is not None)
+
+    with stage("search"):
+        if initial:
+            solution = routing.SolveFromAssignmentWithParameters(initial, p)
+        else:
+            solution = routing.SolveWithParameters(p)
+    incr("callback_calls", cb_calls[0])
     if not solution:
-        routes, polylines = [], []
-        vcount = vehicle_count or 1
-        if vcount == 0:
-            vehicle_profiles = [{"nume": "Vehicle", "capacitate": 10**9, "echipaj": False, "numar": 1}]
-            vcount = 1
-
-        # assign orders (tightest deadline first), by minimal added drive-time
-        order_ids = list(range(len(pd_requests)))
-        order_ids.sort(key=lambda k: float(pd_requests[k].get("time_limit_hrs", MAX_TIME_LIMIT)))
-
-        assignments = [[] for _ in range(vcount)]
-        last_city = [start_city for _ in range(vcount)]
-        for oid in order_ids:
-            o = pd_requests[oid]
-            best_v = None
-            best_cost = float('inf')
-            for vid in range(vcount):
-                cap = vehicle_profiles[vid].get("capacitate", 10**9)
-                if o.get("demand", 0) > cap:
-                    continue
-                c = _estimate_leg_hours(G, coords, last_city[vid], o['pickup']) + \
-                    _estimate_leg_hours(G, coords, o['pickup'], o['delivery'])
-                if c < best_cost:
-                    best_cost = c; best_v = vid
-            if best_v is None:
-                best_v = min(range(vcount), key=lambda vid:
-                             _estimate_leg_hours(G, coords, last_city[vid], o['pickup']) +
-                             _estimate_leg_hours(G, coords, o['pickup'], o['delivery']))
-            assignments[best_v].append(oid)
-            last_city[best_v] = o['delivery']
-
-        # build chained routes: depot -> (p/d)* -> depot
-        for vid in range(vcount):
-            veh = vehicle_profiles[vid]
-            steps = [{'tip': 'plecare', 'oras': start_city, 'distanta': 0, 'durata': 0, 'comanda': None}]
-            polyline = []
-            cur = start_city
-
-            for oid in assignments[vid]:
-                o = pd_requests[oid]
-                s_steps, s_poly = _expand_leg_to_steps(G, coords, cur, o['pickup'], "pickup", order_meta=o)
-                steps += s_steps; polyline += (s_poly if not polyline else s_poly[1:]); cur = o['pickup']
-                s_steps, s_poly = _expand_leg_to_steps(G, coords, cur, o['delivery'], "delivery", order_meta=o)
-                steps += s_steps; polyline += (s_poly if not polyline else s_poly[1:]); cur = o['delivery']
-
-            if cur != start_city:
-                s_steps, s_poly = _expand_leg_to_steps(G, coords, cur, start_city, "intoarcere", order_meta=None)
-                steps += s_steps; polyline += (s_poly if not polyline else s_poly[1:])
-
-            polylines.append(polyline)
-            routes.append({'vehicul': veh, 'traseu': steps})
-
-        return routes, polylines, 0.0
+        return None, None
+    return _node_routes(routing, manager, solution), solution.ObjectiveValue()
+
+def _portfolio_search(data, task):
+    # portfolio worker (separate process): task = (config, seed, initial node routes, seconds)
+    config, seed, init_routes, time_limit = task
+    manager, routing, _ = _build_model(data)
+    p = _search_params(data["time_mode"], config, seed, time_limit)
+    routing.AddSearchMonitor(routing.solver().CustomLimit(stop_requested))   # portfolio cancelled mid-round
+    initial = _initial_assignment(manager, routing, p, init_routes)
+    solution = routing.SolveFromAssignmentWithParameters(initial, p) if initial else routing.SolveWithParameters(p)
+    if not solution:
+        return None
+    return solution.ObjectiveValue(), _node_routes(routing, manager, solution)
+
+def _solve_portfolio(data, init_routes, workers, rounds, progress=None, cancel_event=None):
+    # same wall-clock budget as a single search, split into rounds that share the best incumbent
+    rounds = max(1, rounds)
+    budget = TIME_OPTIMIZATION_LIMIT_SECONDS if data["time_mode"] else SOLVER_TIME_LIMIT_SECONDS
+    per_round = budget / rounds
+    if init_routes is not None:
+        # checked once here: a warm start the model rejects is not shipped to the workers
+        with stage("model_setup"):
+            manager, routing, _ = _build_model(data)
+            if _initial_assignment(manager, routing, _search_params(data["time_mode"]), init_routes) is None:
+                init_routes = None
+        set_value("warm_start", init_routes is not None)
+
+    def tasks(r, best):
+        out = []
+        for w in range(workers):
+            config = PORTFOLIO_CONFIGS[w % len(PORTFOLIO_CONFIGS)]
+            if best is not None:
+                start = best[1]
+            else:
+                # worker 0 keeps the construction warm start; the rest build their own first solution
+                start = init_routes if w == 0 else None
+            out.append((config, w, start, per_round))
+        return out
+
+    def on_round(r, best):
+        set_value(f"portfolio_round_{r}_objective", best[0] if best else None)
+        if progress is not None and best is not None:
+            progress({"round": r + 1, "rounds": rounds, "objective": best[0],
+                      "routes": _stop_cities(data, best[1])})
+
+    set_value("portfolio_workers", workers)
+    with stage("search"):
+        best = run_portfolio(_portfolio_search, data, tasks, rounds=rounds, max_workers=workers,
+                             on_round=on_round,
+                             should_stop=(cancel_event.is_set if cancel_event is not None else None))
+    if best is None:
+        return None, None
+    return best[1], best[0]
 
-    # extract OR-Tools solution 
-    routes, polylines, total_cost = [], [], 0.0
-    for vid in range(vehicle_count):
-        index = routing.Start(vid)
-        if routing.IsEnd(solution.Value(routing.NextVar(index))):
-            continue
+# solver
+def solve_vrp(start_city, pd_requests, coords, vehicle_profiles, routing_mode, allow_split=True, src_map=None,
+              metrics=None, profile=False, trace_memory=False, open_routes=False, warm_start=True,
+              progress=None, cancel_event=None, graph=None, pair_cache=None, departure_hour=None, td_cache=None,
+              portfolio_workers=None, portfolio_rounds=PORTFOLIO_ROUNDS):
+    """Solve the pickup & delivery problem; returns (routes, polylines, total_cost).
+
+    total_cost is km in Economic mode and driving hours in Fast mode (kpi.plan_cost).
+
+    `vehicle_profiles` are vehicle types: each profile stands for `numar`
+    identical trucks. Each vehicle profile may carry its own `start_city` / `end_city` yard and an
+    `open_route` flag (route ends at its last delivery); `start_city` is the
+    default yard and `open_routes=True` opens every route.
+
+    With `warm_start` the regret-insertion heuristic (construction module)
+    seeds the search; the same heuristic is the fallback when it finds nothing.
+
+    `progress(dict)` is called on every improving solution with the partial
+    plan's stop cities per vehicle ("routes"); setting `cancel_event`
+    (threading.Event) stops the search within moments and keeps the best so
+    far, or raises SolveCancelled when it is set before the search starts.
+    If `metrics` is a dict it is filled with per-stage timings, counters and
+    solve facts (see instrumentation.new_metrics). `profile` / `trace_memory`
+    additionally attach a cProfile report / tracemalloc summary to it.
+
+    Long-lived callers can pass a prebuilt road `graph` (built from `coords`)
+    and a `pair_cache` dict that keeps city-pair (km, h) lengths across solves.
+
+    `departure_hour` (clock hour the routes start) turns on time-dependent
+    travel times for roads with a speed profile: the Time dimension reads the
+    duration matrix of the hour bucket each node is left in, estimated from
+    the construction heuristic. A `td_cache` dict keeps those bucketed
+    durations across solves (like `pair_cache`).
+
+    `portfolio_workers` > 1 runs that many search processes on the same model
+    with different first-solution strategies and metaheuristics (see
+    PORTFOLIO_CONFIGS) inside the same time budget and keeps the best; the
+    budget is split into `portfolio_rounds`, each round restarting every worker
+    from the best incumbent so far.
+    """
+    with collect(metrics, profile=profile, trace_memory=trace_memory):
+        return _solve_vrp(start_city, pd_requests, coords, vehicle_profiles, routing_mode, open_routes, warm_start,
+                          progress, cancel_event, graph, pair_cache, departure_hour, td_cache,
+                          portfolio_workers, portfolio_rounds)
+
+def _pair_lengths(G, coords, a, b, pair_cache):
+    # (km, h) shortest-path lengths of one ordered city pair, memoised in pair_cache if given
+    if pair_cache is not None:
+        hit = pair_cache.get((a, b))
+        if hit is not None:
+            incr("pair_cache_hits")
+            return hit
+    d = _safe_graph_distance(G, coords, a, b)
+    t = _safe_graph_duration(G, coords, a, b)
+    if pair_cache is not None:
+        pair_cache[(a, b)] = (d, t)
+    return d, t
+
+def warm_pair_cache(G, coords, cities, pair_cache):
+    """Fill `pair_cache` with every ordered pair of `cities` (shared by later solves)."""
+    for a in cities:
+        for b in cities:
+            if a != b:
+                _pair_lengths(G, coords, a, b, pair_cache)
+    return pair_cache
+
+def _solve_vrp(start_city, pd_requests, coords, vehicle_profiles, routing_mode, open_routes, warm_start,
+               progress=None, cancel_event=None, G=None, pair_cache=None, departure_hour=None, td_cache=None,
+               portfolio_workers=None, portfolio_rounds=PORTFOLIO_ROUNDS):
+    types = vehicle_types(vehicle_profiles or [])
+    if not types:
+        types = [{"nume": "Vehicle", "capacitate": 10**9, "echipaj": False, "numar": 1}]
+    vehicle_profiles, unit_type = expand_fleet(types)
+    ends = [_vehicle_ends(vp, start_city, open_routes) for vp in vehicle_profiles]
+    yards = list(dict.fromkeys([s for s, _ in ends] + [e for _, e in ends if e is not None]))
 
-        seq_nodes = []
-        while not routing.IsEnd(index):
-            node_id = manager.IndexToNode(index)
-            seq_nodes.append(node_list[node_id])
-            index = solution.Value(routing.NextVar(index))
-        seq_nodes.append(start_city)
+    pickups = [r['pickup'] for r in pd_requests]
+    deliveries = [r['delivery'] for r in pd_requests]
+    cities = list(dict.fromkeys(yards + pickups + deliveries))
 
-        steps = [{'tip': 'plecare', 'oras': start_city, 'distanta': 0, 'durata': 0, 'comanda': None}]
-        polyline = []
-        picked = set(); onboard = set()
+    if G is None:
+        with stage("build_graph"):
+            G = build_graph(coords, index_path=ROAD_INDEX_FILE, network_path=ROAD_NETWORK_FILE)
+    n = len(cities)
+    city_index = {c: i for i, c in enumerate(cities)}
+    dist_m = [[0]*n for _ in range(n)]
+    time_m = [[0]*n for _ in range(n)]
+    dist_km = [[0.0]*n for _ in range(n)]   # unrounded copies for the construction heuristic
+    time_h = [[0.0]*n for _ in range(n)]
+    with stage("matrix"):
+        for i in range(n):
+            for j in range(n):
+                if i == j:
+                    d = t = 0
+                else:
+                    d, t = _pair_lengths(G, coords, cities[i], cities[j], pair_cache)
+                dist_km[i][j] = d
+                time_h[i][j] = t
+                dist_m[i][j] = int(round(d))
+                time_m[i][j] = int(round(t))
+
+    vehicle_count = len(vehicle_profiles)
+    capacities = [vp['capacitate'] for vp in vehicle_profiles]
+
+    # node list: yards + open-route sink (no city, zero-cost arcs into it) + (pickup, delivery)
+    node_list = list(yards)
+    node_types = ['depot'] * len(yards)
+    if any(e is None for _, e in ends):
+        node_list.append(None)
+        node_types.append('sink')
+    order_idx = [-1] * len(node_list)
+    base = len(node_list)
+    for i, order in enumerate(pd_requests):
+        node_list += [order['pickup'], order['delivery']]
+        node_types += ['pickup', 'delivery']
+        order_idx += [i, i]
 
-        for a, b in zip(seq_nodes[:-1], seq_nodes[1:]):
-            arr_type = "intermediar"
-            arr_order_meta = None
+    N = len(node_list)
+    node_city = [city_index[c] if c is not None else -1 for c in node_list]
+    yard_node = {c: i for i, c in enumerate(yards)}
+    starts = [yard_node[s] for s, _ in ends]
+    finishes = [yard_node[e] if e is not None else base - 1 for _, e in ends]
+    set_value("orders", len(pd_requests))
+    set_value("cities", n)
+    set_value("nodes", N)
+    set_value("vehicles", vehicle_count)
+    set_value("vehicle_types", len(types))
+    set_value("depots", len(yards))
+
+    _check_cancel(cancel_event)
+    time_mode = routing_mode in ("Timp minim", "Fast")
+    if time_mode:
+        heur_cost, open_cost = time_h, VEHICLE_STARTUP_COST_HOURS
+    else:
+        heur_cost, open_cost = dist_km, VEHICLE_STARTUP_COST_KM
+
+    # construction heuristic: warm start for the search, fallback when it finds nothing
+    init_stops, forced = None, True
+    if warm_start and pd_requests:
+        with stage("construction"):
+            init_stops, forced = _construct(coords, cities, city_index, heur_cost, pd_requests,
+                                            vehicle_profiles, unit_type, ends, open_cost)
+
+    _check_cancel(cancel_event)
+
+    # time-dependent legs: the hour each node is left in, replayed along the constructed routes
+    td = departure_hour is not None and G.graph.get("time_dependent", False)
+    if td:
+        with stage("td_matrix"):
+            td_cache = TravelTimeCache(lambda a, b, h: _safe_graph_duration_at(G, coords, a, b, h), td_cache)
+            node_hour = [float(departure_hour)] * N
+            for vid, stops in enumerate(init_stops or []):
+                t, ci = float(departure_hour), node_city[starts[vid]]
+                for oid, kind in stops:
+                    node = base + 2*oid + (kind == 'delivery')
+                    t += td_cache.duration(cities[ci], node_list[node], t) + DEFAULT_SERVICE_TIME
+                    node_hour[node], ci = t, node_city[node]
+            node_bucket = [hour_bucket(h) for h in node_hour]
+            td_h = {b: td_cache.matrix(cities, b) for b in set(node_bucket)}
+        set_value("td_buckets", len(td_h))
+
+    # everything the OR-Tools model needs, as plain data (portfolio workers rebuild it per process)
+    demands = [0]*N
+    for i, t in enumerate(node_types):
+        if t == 'pickup':
+            demands[i] = pd_requests[order_idx[i]]['demand']
+        elif t == 'delivery':
+            demands[i] = -pd_requests[order_idx[i]]['demand']
+    data = {
+        "N": N, "vehicle_count": vehicle_count, "starts": starts, "finishes": finishes,
+        "cities": cities, "node_city": node_city, "demands": demands, "capacities": capacities, "unit_type": unit_type,
+        "pairs": [(base + 2*i, base + 2*i + 1) for i in range(len(pd_requests))],
+        "time_mode": time_mode, "dist_m": dist_m, "time_m": time_m,
+        "td_h": td_h if td else None, "node_bucket": node_bucket if td else None,
+    }
+    init_routes = None
+    if warm_start and pd_requests and not forced:
+        init_routes = [[base + 2*oid + (kind == 'delivery') for oid, kind in st] for st in init_stops]
+    if warm_start and pd_requests and init_routes is None:
+        set_value("warm_start", False)   # forced orders; otherwise set once the model has read the routes
+
+    _check_cancel(cancel_event)
+    if portfolio_workers and portfolio_workers > 1:
+        node_routes, objective = _solve_portfolio(data, init_routes, portfolio_workers, portfolio_rounds,
+                                                  progress, cancel_event)
+    else:
+        node_routes, objective = _solve_single(data, init_routes, progress, cancel_event)
+    set_value("solution_found", node_routes is not None)
+    if node_routes is not None:
+        set_value("objective", objective)
 
-            for j, order in enumerate(pd_requests):
-                if b == order['pickup'] and j not in picked:
-                    arr_type = "pickup"; arr_order_meta = order
-                    picked.add(j); onboard.add(j); break
+    # fallback (chained, per-vehicle)
+    if node_routes is None:
+        with stage("fallback"):
+            routes, polylines = [], []
+            vcount = vehicle_count
 
-            if arr_type == "intermediar":
-                for j, order in enumerate(pd_requests):
-                    if b == order['delivery'] and j in onboard:
-                        arr_type = "delivery"; arr_order_meta = order
-                        onboard.remove(j); break
+            # regret insertion on the matrices (reuses the warm-start construction if any)
+            if init_stops is None:
+                init_stops, _ = _construct(coords, cities, city_index, heur_cost, pd_requests,
+                                           vehicle_profiles, unit_type, ends, open_cost)
 
-            if b == start_city and arr_type == "intermediar":
-                arr_type = "intoarcere"
+            # build chained routes: start yard -> (p/d)* -> end yard (or last delivery if open)
+            for vid in range(vcount):
+                steps, polyline = _route_steps(G, coords, pd_requests, ends[vid][0], ends[vid][1], init_stops[vid])
+                polylines.append(polyline)
+                routes.append({'vehicul': vehicle_profiles[vid], 'unitate': vid, 'traseu': steps})
+            _stamp_departure(routes, departure_hour)
+            # orders that fit no vehicle were placed anyway; report the overloaded routes
+            set_value("overloaded_routes", stamp_loads(routes))
+
+            set_value("vehicles_used", sum(1 for r in routes if len(r['traseu']) > 1))
+        return routes, polylines, plan_cost(routes, routing_mode)
+
+    # extract OR-Tools solution
+    with stage("extraction"):
+        routes, polylines = [], []
+        for vid, nodes in enumerate(node_routes):
+            if not nodes:
+                continue
 
-            leg_steps, leg_poly = _expand_leg_to_steps(G, coords, a, b, arr_type, order_meta=arr_order_meta)
-            steps += leg_steps
-            polyline += (leg_poly if not polyline else leg_poly[1:])
+            # stops in visiting order, identified by node (not by city name)
+            stops = [(order_idx[node_id], node_types[node_id]) for node_id in nodes]
+            steps, polyline = _route_steps(G, coords, pd_requests, ends[vid][0], ends[vid][1], stops)
+            polylines.append(polyline)
+            routes.append({'vehicul': vehicle_profiles[vid], 'unitate': vid, 'traseu': steps})
+        _stamp_departure(routes, departure_hour)
+        stamp_loads(routes)
 
-        polylines.append(polyline)
-        routes.append({'vehicul': vehicle_profiles[vid], 'traseu': steps})
+    set_value("vehicles_used", len(routes))
 
-    return routes, polylines, 0.0
+    return routes, polylines, plan_cost(routes, routing_mode)